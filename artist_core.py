@@ -0,0 +1,856 @@
+# 画师库核心逻辑（无界面）：GUI (ArtistManager.py) 和命令行 (cli.py) 都只是这里的前端
+# 进度通过 on_event 回调推送：{'event': 'log', 'msg': ...} / {'event': 'progress', 'value': i, 'total': n}
+# Tk / PIL / requests 只在真正用到时才导入，保证命令行启动够快
+import json
+import os
+import re
+import time
+import random
+from collections import deque
+
+import image_pack
+import showcase_index
+
+# ================= 代理设置 =================
+PROXY_PORT = '7897'
+
+# ================= 配置区域 =================
+CONFIG_FILE = 'config.json'
+ARTIST_FILE = 'artists.txt'
+DATA_FILE = 'artist_data.json'
+IMAGE_DIR = 'images'
+STATE_FILE = 'sample_state.json'  # 每位画师当前样图对应的 post id / score / 上次检查时间
+REFRESH_BATCH = 30  # 刷新模式每次只复查最久未检查的 N 位画师
+# 样图目标尺寸（长边像素）：同一张图既用于卡片（HiDPI 下放大）也用于灯箱大图，选能覆盖该尺寸的最小变体
+# Danbooru 的 720x720 变体是 webp，而样图统一存成 .jpg 并按 image/jpeg 提供，所以不收 webp，
+# 这种情况下会选到 sample（长边 850 的 jpg）
+TARGET_SIZE = 720
+VARIANT_EXTS = {'jpg', 'jpeg', 'png'}
+# optimize 命令：长边超过该值的样图缩小后重新压缩
+OPTIMIZE_MAX_SIDE = 720
+OPTIMIZE_QUALITY = 88
+# 使用特定 UA 防止被判定为脚本攻击
+DEFAULT_HEADERS = {'User-Agent': 'NovelAI_Artist_Manager/HighRes_v7'}
+
+API_STATUS_CODES = {
+    200: "请求成功",
+    204: "请求成功 (无内容)",
+    400: "参数错误 (Bad Request)",
+    401: "认证失败 (检查账号/API Key)",
+    403: "拒绝访问 (权限不足/被禁止)",
+    404: "未找到 (Not Found)",
+    410: "分页限制 (Gone)",
+    420: "无效记录",
+    422: "资源锁定或验证失败",
+    423: "资源已存在",
+    424: "参数无效",
+    429: "请求过于频繁 (被限流，请稍后)",
+    500: "服务器内部错误",
+    502: "网关错误 (服务器负载过高)",
+    503: "服务不可用 (Downbooru)",
+}
+
+# 错误分类：fatal 立即终止整轮；throttle / transient 计入熔断窗口，画师稍后重新排队
+# 其余状态码（404 等）以及搜索为空都只算该画师自身的失败 (artist)
+API_ERROR_KINDS = {401: 'fatal', 403: 'fatal', 429: 'throttle', 500: 'transient', 502: 'transient', 503: 'transient'}
+
+# ================= 熔断设置 =================
+BREAKER_WINDOW = 10  # 统计最近 N 次请求
+BREAKER_THRESHOLD = 5  # 其中临时性错误达到该数量即熔断暂停
+BREAKER_MAX_TRIPS = 5  # 连续熔断这么多次仍未恢复则放弃本轮
+BACKOFF_BASE = 30  # 熔断暂停秒数，按 2 倍递增并加随机抖动
+BACKOFF_MAX = 600
+THROTTLE_SLEEP = 10  # 429 时额外等待
+MAX_OUTAGE_RETRIES = 3  # 因故障失败的画师最多重新排队次数
+
+# ================= 批量导入校验 =================
+TAG_LOOKUP_BATCH = 100  # 每次 tags.json / tag_aliases.json 请求查询的名字数
+TAG_CATEGORY_ARTIST = 1
+
+
+def setup_proxy():
+    """联网前才设置代理，导入模块本身不改环境变量；已手动设置的代理不覆盖"""
+    os.environ.setdefault("http_proxy", f"http://127.0.0.1:{PROXY_PORT}")
+    os.environ.setdefault("https_proxy", f"http://127.0.0.1:{PROXY_PORT}")
+
+
+def get_safe_filename(name):
+    return re.sub(r'[\\/*?:"<>|]', "_", name)
+
+
+def clean_name(name):
+    return name.lower().strip().replace('artist:', '').replace(',', '').strip()
+
+
+def parse_import(raw):
+    """解析粘贴的画师串（可直接粘 NAI 提示词，{}/[]/权重语法都认），按出现顺序去重返回名字列表"""
+    raw = re.sub(r'[;；]', ',', raw or '')
+    names = {}
+    for tag, _ in showcase_index.parse_prompt(raw):
+        name, _ = showcase_index.normalize_tag(tag)
+        name = clean_name(name)
+        if name: names[name] = None
+    return list(names)
+
+
+def image_path(name):
+    return os.path.join(IMAGE_DIR, f"{get_safe_filename(name)}.jpg")
+
+
+def load_config():
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, 'r') as f: return json.load(f)
+    return {}
+
+
+def save_config(username, api_key):
+    with open(CONFIG_FILE, 'w') as f: json.dump({'username': username, 'api_key': api_key}, f)
+
+
+class CircuitBreaker:
+    """滑动窗口统计临时性错误，超过阈值时让整轮暂停并指数退避"""
+
+    def __init__(self, window=BREAKER_WINDOW, threshold=BREAKER_THRESHOLD):
+        self.recent = deque(maxlen=window)
+        self.threshold = threshold
+        self.trips = 0  # 连续熔断次数，出现一次成功即清零
+
+    def record(self, kind):
+        """记录一次请求结果，返回是否需要熔断"""
+        bad = kind in ('transient', 'throttle')
+        self.recent.append(bad)
+        if not bad: self.trips = 0
+        return sum(self.recent) >= self.threshold
+
+    def backoff(self):
+        """进入下一次熔断，返回带抖动的暂停秒数；窗口清空，恢复后重新统计"""
+        self.trips += 1
+        self.recent.clear()
+        return min(BACKOFF_BASE * 2 ** (self.trips - 1), BACKOFF_MAX) * random.uniform(0.5, 1.5)
+
+
+class ArtistLibrary:
+    def __init__(self, on_event=None):
+        self.on_event = on_event or (lambda ev: None)
+        self.artists = []
+        self.user = ''  # 下载时带进 UA
+        self.load_artists_from_file()
+
+    # ================= 事件 =================
+    def log(self, msg):
+        self.on_event({'event': 'log', 'msg': msg})
+
+    def progress(self, value, total):
+        self.on_event({'event': 'progress', 'value': value, 'total': total})
+
+    # ================= 数据文件 =================
+    def load_artists_from_file(self):
+        if not os.path.exists(ARTIST_FILE): open(ARTIST_FILE, 'w').close()
+        with open(ARTIST_FILE, 'r', encoding='utf-8') as f: l = f.readlines()
+        self.artists = sorted(list(set([clean_name(x) for x in l if clean_name(x)])))
+
+    def save_artists_to_file(self):
+        with open(ARTIST_FILE, 'w', encoding='utf-8') as f:
+            for a in sorted(self.artists): f.write(a + "\n")
+
+    def manage_json_record(self, delete_name=None, add_name=None, add_path=None):
+        """原子化管理 JSON 数据：删旧 + 增新 + 排序"""
+        data = []
+        if os.path.exists(DATA_FILE):
+            try:
+                with open(DATA_FILE, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except:
+                data = []
+
+        if delete_name:
+            data = [item for item in data if item['name'] != delete_name]
+
+        if add_name:
+            data = [item for item in data if item['name'] != add_name]
+            data.append({"name": add_name, "image": add_path})
+
+        data.sort(key=lambda x: x['name'])
+
+        with open(DATA_FILE, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    def load_state(self):
+        if os.path.exists(STATE_FILE):
+            try:
+                with open(STATE_FILE, 'r', encoding='utf-8') as f: return json.load(f)
+            except:
+                pass
+        return {}
+
+    def save_state(self, state):
+        state = {k: v for k, v in state.items() if k in self.artists}
+        with open(STATE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(state.items())), f, ensure_ascii=False, indent=2)
+
+    def mark_manual(self, name):
+        state = self.load_state()
+        state[name] = {'manual': True, 'checked': int(time.time())}
+        self.save_state(state)
+
+    # ================= 图片存取 =================
+    def pack_put(self, path, final_path=None):
+        """启用 pack 时把刚写好的图片追加进去"""
+        pack = image_pack.get_pack()
+        if pack:
+            pack.put_file(path, image_pack.pack_key(final_path or path))
+
+    def has_image(self, path):
+        if os.path.exists(path): return True
+        pack = image_pack.get_pack()
+        return bool(pack) and image_pack.pack_key(path) in pack
+
+    def open_image(self, path):
+        """返回 PIL Image；本地文件优先，不存在时从 pack 里读"""
+        from PIL import Image
+        if os.path.exists(path):
+            return Image.open(path)
+        import io
+        return Image.open(io.BytesIO(image_pack.get_pack().get(image_pack.pack_key(path))))
+
+    def process_and_save_image(self, source_path, artist_name):
+        """把任意图片转成样图 jpg，失败时抛出异常由前端提示"""
+        from PIL import Image
+        if not os.path.exists(IMAGE_DIR): os.makedirs(IMAGE_DIR)
+        target_path = image_path(artist_name)
+
+        img = Image.open(source_path)
+        img = img.convert('RGB')
+        # 质量设为 95 保证清晰度
+        img.save(target_path, 'JPEG', quality=95)
+        self.pack_put(target_path)
+
+        self.log(f"图片处理完成: {target_path}")
+        return target_path
+
+    # ================= 库管理 =================
+    def add_artist(self, name, source_path=None):
+        """新增画师（可附带手动指定的样图），返回清洗后的名字"""
+        n = clean_name(name)
+        if not n: return None
+        if n not in self.artists: self.artists.append(n); self.save_artists_to_file()
+        if source_path:
+            np = self.process_and_save_image(source_path, n)
+            self.manage_json_record(add_name=n, add_path=np)
+            self.mark_manual(n)
+        return n
+
+    def import_text(self, raw):
+        """批量导入（不联网校验）：返回新增的名字列表"""
+        return self.add_many(parse_import(raw))
+
+    def add_many(self, names):
+        """一次性加入多个名字，只写一次文件，返回真正新增的"""
+        existing = set(self.artists)
+        added = [n for n in dict.fromkeys(names) if n and n not in existing]
+        if added:
+            self.artists.extend(added)
+            self.save_artists_to_file()
+        return added
+
+    def plan_import(self, raw, u, k):
+        """解析并联网校验，返回导入计划（不修改画师库）：
+        add 为确认存在的画师（别名已换成正式名），aliases 为 {原名: 正式名}，
+        unknown 为 Danbooru 上查不到的画师标签（多半是拼写错误），suggest 为库里相近的名字；
+        校验失败时 error 不为空、add 为空，未校验的新名字放在 unchecked 里"""
+        names = parse_import(raw)
+        existing = set(self.artists)
+        new = [n for n in names if n not in existing]
+        plan = {'parsed': len(names), 'existing': len(names) - len(new), 'add': [], 'aliases': {},
+                'unknown': [], 'empty': [], 'suggest': {}, 'unchecked': [], 'error': None}
+        if not new: return plan
+
+        setup_proxy()
+        self.user = u
+        aliases, err = self._lookup('tag_aliases.json', 'antecedent_name_comma', new, u, k,
+                                    {'search[status]': 'active', 'only': 'antecedent_name,consequent_name'})
+        if err is None:
+            aliases = {a.get('antecedent_name'): a.get('consequent_name') for a in aliases
+                       if isinstance(a, dict) and a.get('consequent_name')}
+            wanted = list(dict.fromkeys(aliases.get(n, n) for n in new))
+            tags, err = self._lookup('tags.json', 'name_comma', wanted, u, k,
+                                     {'search[category]': TAG_CATEGORY_ARTIST, 'only': 'name,post_count'})
+        if err:
+            # 校验不了就什么都不加，由前端决定是否跳过校验直接导入 unchecked
+            plan['error'] = err
+            plan['unchecked'] = new
+            return plan
+
+        counts = {t.get('name'): t.get('post_count', 0) for t in tags if isinstance(t, dict)}
+        for n in new:
+            target = aliases.get(n, n)
+            if target not in counts:
+                plan['unknown'].append(n)
+                continue
+            if not counts[target]:
+                plan['empty'].append(n)
+                continue
+            if target != n: plan['aliases'][n] = target
+            if target not in existing: plan['add'].append(target)
+        plan['add'] = list(dict.fromkeys(plan['add']))
+
+        if plan['unknown']:
+            import difflib
+            for n in plan['unknown']:
+                close = difflib.get_close_matches(n, self.artists, n=3, cutoff=0.8)
+                if close: plan['suggest'][n] = close
+        return plan
+
+    def import_report(self, plan):
+        """把导入计划整理成几行可读的摘要"""
+        lines = [f"解析 {plan['parsed']} 个名字，已在库中 {plan['existing']} 个，可导入 {len(plan['add'])} 个"]
+        if plan['error']:
+            lines.append(f"⚠️ 未能联网校验: {plan['error']}")
+        if plan['aliases']:
+            lines.append(f"别名 {len(plan['aliases'])} 个（将使用正式名）: "
+                         + ", ".join(f"{a} -> {b}" for a, b in plan['aliases'].items()))
+        if plan['unknown']:
+            lines.append(f"查无此画师 {len(plan['unknown'])} 个: "
+                         + ", ".join(n + (f" (库中有 {'/'.join(plan['suggest'][n])})" if n in plan['suggest'] else "")
+                                     for n in plan['unknown']))
+        if plan['empty']:
+            lines.append(f"没有作品 {len(plan['empty'])} 个: {', '.join(plan['empty'])}")
+        return lines
+
+    def replace_image(self, name, source_path):
+        np = self.process_and_save_image(source_path, name)
+        self.manage_json_record(add_name=name, add_path=np)
+        self.mark_manual(name)
+        return np
+
+    def rename(self, old_name, new_name):
+        """重命名画师及其样图，返回新名字；名字无效或已存在时抛 ValueError"""
+        clean_new = clean_name(new_name)
+        if not clean_new or clean_new == old_name: return None
+        if clean_new in self.artists:
+            raise ValueError("名字已存在")
+        if old_name not in self.artists:
+            raise ValueError(f"画师不存在: {old_name}")
+
+        self.artists[self.artists.index(old_name)] = clean_new
+        self.save_artists_to_file()
+
+        old_path = image_path(old_name)
+        new_path = image_path(clean_new)
+
+        has_img = False
+        if os.path.exists(old_path):
+            try:
+                os.rename(old_path, new_path)
+                has_img = True
+                self.log(f"文件重命名: {old_path} -> {new_path}")
+            except Exception as e:
+                self.log(f"重命名文件失败: {e}")
+        pack = image_pack.get_pack()
+        old_key, new_key = image_pack.pack_key(old_path), image_pack.pack_key(new_path)
+        if pack and old_key in pack:
+            pack.put(new_key, pack.get(old_key))
+            pack.delete(old_key)
+            has_img = True
+
+        state = self.load_state()
+        if old_name in state:
+            state[clean_new] = state.pop(old_name)
+            self.save_state(state)
+
+        if has_img:
+            self.manage_json_record(delete_name=old_name, add_name=clean_new, add_path=new_path)
+        else:
+            self.manage_json_record(delete_name=old_name)
+        return clean_new
+
+    def delete(self, name):
+        if name in self.artists:
+            self.artists.remove(name)
+            self.save_artists_to_file()
+        path = image_path(name)
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+            except:
+                pass
+        pack = image_pack.get_pack()
+        if pack: pack.delete(image_pack.pack_key(path))
+        self.manage_json_record(delete_name=name)
+
+    def optimize(self, max_side=OPTIMIZE_MAX_SIDE, quality=OPTIMIZE_QUALITY):
+        """缩小过大的样图并重新压缩成真正的 JPEG（部分旧样图是 png/webp 内容），只在变小时覆盖"""
+        from PIL import Image
+        stats = {'checked': 0, 'optimized': 0, 'saved': 0}
+        names = [a for a in self.artists if os.path.exists(image_path(a))]
+        for i, art in enumerate(names):
+            self.progress(i + 1, len(names))
+            path = image_path(art)
+            stats['checked'] += 1
+            try:
+                with Image.open(path) as img:
+                    fmt = img.format
+                    if fmt == 'JPEG' and max(img.size) <= max_side:
+                        continue
+                    img = img.convert('RGB')
+                    if max(img.size) > max_side:
+                        r = max_side / max(img.size)
+                        img = img.resize((int(img.width * r), int(img.height * r)), Image.Resampling.LANCZOS)
+                    tmp = path + '.part'
+                    img.save(tmp, 'JPEG', quality=quality, optimize=True)
+                before, after = os.path.getsize(path), os.path.getsize(tmp)
+                if after < before or fmt != 'JPEG':
+                    os.replace(tmp, path)
+                    self.pack_put(path)
+                    stats['optimized'] += 1
+                    stats['saved'] += before - after
+                    self.log(f"{art}: {fmt} {before // 1024}KB -> {after // 1024}KB")
+                else:
+                    os.remove(tmp)
+            except Exception as e:
+                self.log(f"{art}: ⚠️ 处理失败 ({e})")
+        self.log(f"优化完成: 检查 {stats['checked']} | 重新压缩 {stats['optimized']} | "
+                 f"节省 {stats['saved'] / 1024 / 1024:.2f}MB")
+        return stats
+
+    def export(self, out_dir=None):
+        """重新生成网页用的 JSON 清单；指定 out_dir 时把整个站点同步过去（只复制有变动的文件）"""
+        import shutil
+
+        data = [{"name": a, "image": image_path(a)} for a in self.artists if self.has_image(image_path(a))]
+        with open(DATA_FILE, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        self.log(f"artist_data.json: {len(data)} 位画师")
+        if os.path.exists(showcase_index.SHOWCASE_FILE):
+            idx, n = showcase_index.build_index()
+            self.log(f"showcase_index.json: {len(idx['artists'])} 位画师 (重新解析 {n})")
+        self.rebuild_similarity()
+
+        copied = 0
+        if out_dir:
+            files = ['index.html', 'gallery.html', DATA_FILE, 'showcase.json', showcase_index.INDEX_FILE,
+                     'similar_artists.json']
+            for d in (IMAGE_DIR, 'gallery_images'):
+                if os.path.isdir(d):
+                    files += [os.path.join(d, fn) for fn in os.listdir(d)]
+            pack = image_pack.get_pack()
+            for src in files:
+                dst = os.path.join(out_dir, src)
+                if not os.path.exists(src): continue
+                if os.path.exists(dst) and os.path.getsize(dst) == os.path.getsize(src) \
+                        and os.path.getmtime(dst) >= os.path.getmtime(src):
+                    continue
+                os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+                shutil.copy2(src, dst)
+                copied += 1
+            if pack:
+                # pack 里有但本地没有的图片
+                for key in pack.keys():
+                    dst = os.path.join(out_dir, *key.split('/'))
+                    if os.path.exists(key) or os.path.exists(dst): continue
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    with open(dst, 'wb') as f: f.write(pack.get(key))
+                    copied += 1
+            self.log(f"已同步到 {out_dir}: 复制 {copied} 个文件")
+        return {'artists': len(data), 'copied': copied}
+
+    def rebuild_similarity(self):
+        """增量更新画风相似度索引（依赖 numpy，未安装时跳过）"""
+        try:
+            import similarity_index
+        except ImportError:
+            self.log("未安装 numpy，跳过相似度索引")
+            return
+        try:
+            similarity_index.build_index(log=self.log)
+        except Exception as e:
+            self.log(f"相似度索引更新失败: {e}")
+
+    # ================= 自动更新逻辑 (含高清修复) =================
+    def update(self, user, key):
+        """下载所有缺少样图的画师，返回统计；stats['aborted'] 不为空表示提前终止"""
+        setup_proxy()
+        self.user = user
+        self.log("=== 🚀 开始自动更新 ===")
+        if not os.path.exists(IMAGE_DIR): os.makedirs(IMAGE_DIR)
+
+        stats = {'total': len(self.artists), 'skip': 0, 'new': 0, 'fail': [], 'outage': [], 'aborted': None}
+
+        # 读取现有数据
+        res_map = {}
+        if os.path.exists(DATA_FILE):
+            try:
+                with open(DATA_FILE, 'r', encoding='utf-8') as f:
+                    res_map = {item['name']: item['image'] for item in json.load(f)}
+            except:
+                pass
+        state = self.load_state()
+
+        breaker = CircuitBreaker()
+        queue = deque(enumerate(self.artists))
+        attempts = {}
+
+        while queue:
+            i, art = queue.popleft()
+            self.progress(i + 1, stats['total'])
+            path = image_path(art)
+
+            # 检查本地
+            if self.has_image(path):
+                stats['skip'] += 1
+                res_map[art] = path
+                self.log(f"[{i + 1}] {art}: ✅ 已存在")
+                continue
+
+            # 下载
+            self.log(f"[{i + 1}] {art}: ⏳ 搜索中...")
+
+            # 第一尝试：全年龄
+            rating = 'rating:general'
+            post, error_msg, kind = self._fetch(art, rating, user, key)
+
+            # 如果没找到且没有严重错误，尝试无分级限制（可能是R18画师）
+            if not post and (error_msg and "为空" in error_msg):
+                self.log(f"    -> ⚠️ 全年龄未找到，尝试全部分级...")
+                time.sleep(1)  # 稍微暂停防止429
+                rating = ''
+                post, error_msg, kind = self._fetch(art, rating, user, key)
+
+            if post:
+                self.log(f"    -> 捕捉到链接，下载中...")
+                ok, kind = self._dl(post['url'], path)
+                if ok:
+                    stats['new'] += 1
+                    res_map[art] = path
+                    state[art] = {'post_id': post['id'], 'score': post['score'], 'rating': rating,
+                                  'checked': int(time.time())}
+                    self.log(f"    -> 🎉 成功")
+                else:
+                    error_msg = "下载流断开或写入失败"
+
+            if kind == 'fatal':
+                # 认证/代理配置错误，继续跑只会全部失败
+                stats['aborted'] = error_msg
+                queue.appendleft((i, art))
+                self.log(f"    -> ⛔ {error_msg}，终止本轮")
+                break
+
+            if kind in ('transient', 'throttle'):
+                attempts[art] = attempts.get(art, 0) + 1
+                if attempts[art] <= MAX_OUTAGE_RETRIES:
+                    queue.append((i, art))
+                    self.log(f"    -> ⚠️ {error_msg}，稍后重试")
+                else:
+                    stats['outage'].append(art)
+                    self.log(f"    -> ⚠️ {error_msg}，已重试 {attempts[art]} 次，留到下次")
+                if kind == 'throttle':
+                    time.sleep(THROTTLE_SLEEP * random.uniform(1, 2))
+            elif kind:
+                stats['fail'].append(art)
+                # 打印具体的 API 错误信息
+                self.log(f"    -> ❌ 获取失败: {error_msg}")
+
+            if breaker.record(kind):
+                if breaker.trips >= BREAKER_MAX_TRIPS:
+                    stats['aborted'] = f"连续 {breaker.trips} 次熔断后服务仍未恢复"
+                    self.log(f"⛔ {stats['aborted']}，终止本轮")
+                    break
+                delay = breaker.backoff()
+                self.log(f"⏸️ 最近请求错误过多，熔断暂停 {delay:.0f}s 后重试...")
+                time.sleep(delay)
+
+            # 增加延时，防止 429 User Throttled
+            time.sleep(2)
+
+        # 终止时尚未处理的画师同样属于故障，下次运行会自动重试
+        stats['outage'].extend(art for _, art in queue
+                               if art not in stats['outage'] and not self.has_image(image_path(art)))
+
+        # 保存结果
+        final_list = [{"name": k, "image": v} for k, v in res_map.items() if k in self.artists]
+        final_list.sort(key=lambda x: x['name'])
+        with open(DATA_FILE, 'w', encoding='utf-8') as f:
+            json.dump(final_list, f, ensure_ascii=False, indent=2)
+        self.save_state(state)
+        if stats['new']: self.rebuild_similarity()
+
+        # 报告
+        sep = "=" * 30
+        self.log(f"\n{sep}\n统计报告\n{sep}")
+        self.log(f"总数: {stats['total']} | 跳过: {stats['skip']} | 新增: {stats['new']} | 失败: {len(stats['fail'])}"
+                 f" | 故障未完成: {len(stats['outage'])}")
+        if stats['fail']:
+            self.log("失败列表 (请检查日志中的具体错误原因):")
+            for f in stats['fail']: self.log(f"artist:{f}")
+        if stats['outage']:
+            self.log(f"因服务故障未完成 {len(stats['outage'])} 位，不计为失败，下次更新会自动重试")
+        return stats
+
+    def refresh(self, user, key, batch_size=REFRESH_BATCH):
+        """增量刷新：只复查最久未检查的 batch_size 位画师，出现更高分的作品才替换样图"""
+        setup_proxy()
+        self.user = user
+        self.log(f"=== 🔄 开始增量刷新 (本次最多 {batch_size} 位) ===")
+        state = self.load_state()
+
+        # 只刷新已有样图的画师，按上次检查时间从旧到新排序
+        # 手动指定的样图不参与刷新
+        candidates = [a for a in self.artists
+                      if not state.get(a, {}).get('manual') and self.has_image(image_path(a))]
+        candidates.sort(key=lambda a: state.get(a, {}).get('checked', 0))
+        batch = candidates[:batch_size]
+
+        stats = {'checked': 0, 'replaced': 0, 'baseline': 0, 'fail': [], 'outage': [], 'aborted': None}
+        breaker = CircuitBreaker()
+
+        for i, art in enumerate(batch):
+            self.progress(i + 1, len(batch))
+            path = image_path(art)
+            old = state.get(art)
+            # 没有来源记录的旧样图不知道分级，和 update 一样先查全年龄、为空再查全部分级
+            known = bool(old and 'post_id' in old)
+            rating = old.get('rating', 'rating:general') if known else 'rating:general'
+
+            # 一次请求取前 10 个最高分结果（和 update 一样，跳过视频/动图仍能找到图片）
+            post, error_msg, kind = self._fetch(art, rating, user, key)
+            if not known and not post and error_msg and "为空" in error_msg:
+                time.sleep(1)
+                rating = ''
+                post, error_msg, kind = self._fetch(art, rating, user, key)
+            if post:
+                record = {'post_id': post['id'], 'score': post['score'], 'rating': rating,
+                          'checked': int(time.time())}
+                if not known:
+                    # 旧版本下载的样图没有记录来源，直接记为基线，不重复下载
+                    state[art] = record
+                    stats['baseline'] += 1
+                    self.log(f"[{i + 1}] {art}: 📌 记录基线 (post #{post['id']}, score {post['score']})")
+                elif post['id'] != old.get('post_id') and post['score'] > old.get('score', 0):
+                    tmp_path = path + '.part'
+                    ok, kind = self._dl(post['url'], tmp_path)
+                    if ok:
+                        os.replace(tmp_path, path)
+                        state[art] = record
+                        stats['replaced'] += 1
+                        self.log(f"[{i + 1}] {art}: ✨ 替换为 post #{post['id']} (score {old.get('score', 0)} -> {post['score']})")
+                    else:
+                        error_msg = "新样图下载失败，保留旧图"
+                else:
+                    # 同步当前最高分，之后只有超过它的作品才替换
+                    old['checked'] = record['checked']
+                    old['score'] = record['score']
+                    old.pop('fails', None)
+                    self.log(f"[{i + 1}] {art}: ✅ 无更优作品")
+
+            if kind == 'fatal':
+                stats['aborted'] = error_msg
+                self.log(f"⛔ {error_msg}，终止本轮")
+                break
+            stats['checked'] += 1
+
+            if kind in ('transient', 'throttle'):
+                # 服务故障不是画师的问题：不更新检查时间，下次刷新仍排在最前
+                stats['outage'].append(art)
+                self.log(f"[{i + 1}] {art}: ⚠️ {error_msg}，留到下次")
+                if kind == 'throttle':
+                    time.sleep(THROTTLE_SLEEP * random.uniform(1, 2))
+            elif kind:
+                # 画师自身的问题（搜索为空等）同样记为已检查，排到队尾，避免每轮都卡在最前面
+                stats['fail'].append(art)
+                self.log(f"[{i + 1}] {art}: ❌ {error_msg}")
+                entry = state.setdefault(art, {})
+                entry['checked'] = int(time.time())
+                entry['fails'] = entry.get('fails', 0) + 1
+
+            if breaker.record(kind):
+                if breaker.trips >= BREAKER_MAX_TRIPS:
+                    stats['aborted'] = f"连续 {breaker.trips} 次熔断后服务仍未恢复"
+                    self.log(f"⛔ {stats['aborted']}，终止本轮")
+                    break
+                delay = breaker.backoff()
+                self.log(f"⏸️ 最近请求错误过多，熔断暂停 {delay:.0f}s 后重试...")
+                time.sleep(delay)
+
+            time.sleep(2)
+
+        self.save_state(state)
+        if stats['replaced']: self.rebuild_similarity()
+
+        self.log(f"检查: {stats['checked']} | 替换: {stats['replaced']} | 基线: {stats['baseline']} | 失败: {len(stats['fail'])}"
+                 f" | 故障未完成: {len(stats['outage'])}")
+        return stats
+
+    def _lookup(self, endpoint, field, names, u, k, extra):
+        """按 TAG_LOOKUP_BATCH 分批用 search[field]=a,b,c 查询，返回 (合并后的结果列表, 错误信息)"""
+        import requests
+        headers = DEFAULT_HEADERS.copy()
+        if u: headers['User-Agent'] = f'NovelAI_Artist_Manager/2.0 ({u})'
+        rows = []
+        try:
+            for i in range(0, len(names), TAG_LOOKUP_BATCH):
+                chunk = names[i:i + TAG_LOOKUP_BATCH]
+                params = dict(extra, limit=len(chunk))
+                params[f'search[{field}]'] = ','.join(chunk)
+                r = requests.get(f'https://danbooru.donmai.us/{endpoint}', params=params, auth=(u, k),
+                                 headers=headers, timeout=15)
+                if r.status_code != 200:
+                    return None, f"API {r.status_code}: {API_STATUS_CODES.get(r.status_code, '未知错误')}"
+                rows.extend(r.json())
+        except requests.exceptions.ProxyError:
+            return None, f"代理 127.0.0.1:{PROXY_PORT} 无法连接"
+        except requests.exceptions.ConnectionError:
+            return None, "网络连接失败 (DNS/代理问题)"
+        except requests.exceptions.Timeout:
+            return None, "请求超时"
+        except json.JSONDecodeError:
+            return None, "API 返回了非 JSON 数据 (可能是 Cloudflare 拦截)"
+        except Exception as e:
+            return None, f"脚本异常: {str(e)}"
+        return rows, None
+
+    # ================= 关键修改：API 获取逻辑 =================
+    def _fetch(self, t, ex, u, k, limit=10):
+        import requests
+        try:
+            # 构造 Tag，处理 ex 为空的情况
+            search_tag = f'{t} {ex} order:score'.strip()
+
+            params = {
+                'tags': search_tag,
+                'limit': limit,  # 获取多个结果，以便跳过视频
+                # 增加 file_ext 用于客户端过滤视频，score 用于增量刷新比较
+                'only': 'large_file_url,file_url,preview_file_url,id,score,file_ext,media_asset'
+            }
+
+            # 优化 UA，包含用户名有助于防止被封禁（如果用户填了的话）
+            headers = DEFAULT_HEADERS.copy()
+            if u:
+                headers['User-Agent'] = f'NovelAI_Artist_Manager/2.0 ({u})'
+
+            # 发起请求
+            r = requests.get('https://danbooru.donmai.us/posts.json',
+                             params=params,
+                             auth=(u, k),
+                             headers=headers,
+                             timeout=15)
+
+            # 状态码判断
+            if r.status_code == 200:
+                data = r.json()
+                if not data:
+                    return None, "搜索结果为空 (Tag可能不匹配)", 'artist'
+
+                # 遍历结果，跳过视频文件
+                VIDEO_EXTS = {'mp4', 'webm', 'zip', 'rar', 'swf'}
+                for post in data:
+                    file_ext = post.get('file_ext', '').lower()
+                    if file_ext in VIDEO_EXTS:
+                        continue  # 跳过视频/压缩包
+
+                    url = (self._pick_variant(post) or post.get('large_file_url') or post.get('file_url')
+                           or post.get('preview_file_url'))
+                    if url:
+                        return {'url': url, 'id': post.get('id'), 'score': post.get('score', 0)}, None, None
+
+                # 所有结果都是视频或无链接
+                return None, f"找到 {len(data)} 条记录但均为视频或无图片链接", 'artist'
+
+            else:
+                # 返回具体的 HTTP 错误码和文档描述
+                error_desc = API_STATUS_CODES.get(r.status_code, "未知错误")
+                return None, f"API {r.status_code}: {error_desc}", API_ERROR_KINDS.get(r.status_code, 'artist')
+
+        except requests.exceptions.ProxyError:
+            return None, f"代理 127.0.0.1:{PROXY_PORT} 无法连接", 'fatal'
+        except requests.exceptions.ConnectionError:
+            return None, "网络连接失败 (DNS/代理问题)", 'transient'
+        except requests.exceptions.Timeout:
+            return None, "请求超时", 'transient'
+        except json.JSONDecodeError:
+            return None, "API 返回了非 JSON 数据 (可能是 Cloudflare 拦截)", 'transient'
+        except Exception as e:
+            return None, f"脚本异常: {str(e)}", 'artist'
+
+    def _pick_variant(self, post):
+        """从 media_asset.variants 里挑长边 >= TARGET_SIZE 的最小变体，不够大时才退到更大的"""
+        variants = (post.get('media_asset') or {}).get('variants') or []
+        usable = [v for v in variants
+                  if v.get('url') and v.get('type') not in ('crop', 'original')
+                  and str(v.get('file_ext', '')).lower() in VARIANT_EXTS]
+        if not usable:
+            return None
+        usable.sort(key=lambda v: v.get('width', 0) * v.get('height', 0))
+        for v in usable:
+            if max(v.get('width', 0), v.get('height', 0)) >= TARGET_SIZE:
+                return v['url']
+        # 原图本身就很小时，所有变体都不够大，让调用方退回原图链接
+        return None
+
+    def _dl(self, u, p):
+        """下载并校验样图，返回 (是否成功, 错误分类)；分类与 _fetch 相同，供熔断和重新排队使用"""
+        import requests
+        from PIL import Image
+        try:
+            # 1. 发起请求，增加 headers 伪装
+            headers = DEFAULT_HEADERS.copy()
+            # 如果配置里有 user，带上 user 更好
+            if self.user: headers['User-Agent'] = f'NovelAI_Artist_Manager/2.0 ({self.user})'
+
+            with requests.get(u, stream=True, timeout=20, headers=headers, verify=False) as r:
+                r.raise_for_status()
+
+                # 2. 检查 Content-Type (防止把 html 网页当图片下)
+                ct = r.headers.get('Content-Type', '').lower()
+                if 'image' not in ct and 'octet-stream' not in ct:
+                    self.log(f"    -> ⚠️ 警告: 服务器返回的不是图片，而是 {ct}")
+                    return False, 'artist'
+
+                # 3. 检查文件大小，>1MB 的文件可能是视频或异常文件
+                content_length = int(r.headers.get('Content-Length', 0))
+                if content_length > 1 * 1024 * 1024:  # 1MB
+                    self.log(f"    -> ⚠️ 文件过大 ({content_length/1024/1024:.2f}MB)，跳过")
+                    return False, 'artist'
+
+                # 3. 写入文件
+                with open(p, 'wb') as f:
+                    for chunk in r.iter_content(8192):
+                        f.write(chunk)
+
+            # 4. 【关键步骤】下载完成后，校验图片完整性
+            # 如果是网页或坏文件，这里会报错，从而触发 except 删除坏文件
+            try:
+                with Image.open(p) as img:
+                    img.verify()  # 校验文件结构是否损坏
+            except Exception as e:
+                self.log(f"    -> ⚠️ 图片文件损坏或无效，已删除 ({e})")
+                if os.path.exists(p):
+                    os.remove(p)  # 删掉坏文件，防止看着闹心
+                return False, 'artist'
+
+            # 刷新模式先写到 .part 再替换，pack 里按最终文件名入库；pack 写入失败不影响已下载的图片
+            try:
+                self.pack_put(p, p[:-len('.part')] if p.endswith('.part') else p)
+            except Exception as e:
+                self.log(f"    -> ⚠️ 写入 images.pack 失败 ({e})，图片已保存在磁盘")
+            return True, None
+
+        except Exception as e:
+            # 如果发生网络错误，也要确保没有留下半截的坏文件
+            if os.path.exists(p):
+                try:
+                    os.remove(p)
+                except:
+                    pass
+            # CDN 故障 / 限流要计入熔断并重新排队，不能记成画师自身的失败
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            if isinstance(e, requests.exceptions.ProxyError):
+                kind = 'fatal'
+            elif status is not None:
+                kind = 'throttle' if status == 429 else 'transient' if status >= 500 else 'artist'
+            elif isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                                requests.exceptions.ChunkedEncodingError)):
+                kind = 'transient'
+            else:
+                kind = 'artist'
+            self.log(f"    -> ⚠️ 下载出错: {e}")
+            return False, kind
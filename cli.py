@@ -0,0 +1,144 @@
+# 命令行入口（无界面，可在服务器 / cron 上运行）
+# 用法: python cli.py [--json] <update|import|rename|delete|optimize|export|watch> ...
+import argparse
+import json
+import sys
+import time
+
+import artist_core
+
+
+def make_printer(as_json):
+    """--json 时每个事件输出一行 JSON（便于管道/日志采集），否则只打印日志文本"""
+    def emit(ev):
+        if as_json:
+            print(json.dumps(dict(ev, ts=round(time.time(), 3)), ensure_ascii=False), flush=True)
+        elif ev['event'] == 'log':
+            print(ev['msg'], flush=True)
+    return emit
+
+
+def credentials(args):
+    config = artist_core.load_config()
+    user = args.user or config.get('username', '')
+    key = args.key or config.get('api_key', '')
+    if not user or not key:
+        sys.exit("请先在 config.json 中配置 API 信息，或使用 --user / --key")
+    return user, key
+
+
+def cmd_update(lib, args):
+    user, key = credentials(args)
+    if args.refresh:
+        return lib.refresh(user, key, args.batch)
+    return lib.update(user, key)
+
+
+def cmd_import(lib, args):
+    if args.file == '-':
+        raw = sys.stdin.read()
+    else:
+        with open(args.file, encoding='utf-8') as f:
+            raw = f.read()
+    if args.no_check:
+        added = lib.import_text(raw)
+        lib.log(f"导入 {len(added)} 位新画师")
+        return {'added': added}
+    plan = lib.plan_import(raw, *credentials(args))
+    for line in lib.import_report(plan): lib.log(line)
+    if plan['error']:
+        # 校验失败时不导入未经确认的名字，退出码非 0；确实要导入请用 --no-check
+        return dict(plan, added=[], aborted=plan['error'])
+    if args.dry_run:
+        return plan
+    added = lib.add_many(plan['add'])
+    lib.log(f"导入 {len(added)} 位新画师")
+    return dict(plan, added=added)
+
+
+def cmd_rename(lib, args):
+    new = lib.rename(args.old, args.new)
+    lib.log(f"{args.old} -> {new}" if new else "名字未变化")
+    return {'renamed': new}
+
+
+def cmd_delete(lib, args):
+    missing = [n for n in args.names if n not in lib.artists]
+    for n in args.names:
+        if n not in missing: lib.delete(n)
+    lib.log(f"已删除 {len(args.names) - len(missing)} 位" + (f"，不存在: {', '.join(missing)}" if missing else ""))
+    return {'deleted': [n for n in args.names if n not in missing], 'missing': missing}
+
+
+def cmd_optimize(lib, args):
+    return lib.optimize(args.max_side, args.quality)
+
+
+def cmd_export(lib, args):
+    return lib.export(args.out)
+
+
+def cmd_watch(lib, args):
+    import watcher
+    return watcher.run(lib, args.poll)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="NovelAI 画师图鉴管理器 (命令行)")
+    parser.add_argument('--json', action='store_true', help="以 JSON Lines 输出进度事件")
+    parser.add_argument('--user', help="Danbooru 用户名 (默认读 config.json)")
+    parser.add_argument('--key', help="Danbooru API Key (默认读 config.json)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('update', help="下载缺少样图的画师")
+    p.add_argument('--refresh', action='store_true', help="增量刷新最久未检查的画师样图")
+    p.add_argument('--batch', type=int, default=artist_core.REFRESH_BATCH, help="刷新模式每次检查的数量")
+    p.set_defaults(func=cmd_update)
+
+    p = sub.add_parser('import', help="批量导入画师名（逗号/换行分隔，支持 NAI 权重语法），默认先到 Danbooru 校验")
+    p.add_argument('file', nargs='?', default='-', help="文本文件，默认读标准输入")
+    p.add_argument('--no-check', action='store_true', help="不联网校验，解析后直接导入")
+    p.add_argument('--dry-run', action='store_true', help="只输出校验报告，不修改画师库")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser('rename', help="重命名画师")
+    p.add_argument('old')
+    p.add_argument('new')
+    p.set_defaults(func=cmd_rename)
+
+    p = sub.add_parser('delete', help="删除画师及其样图")
+    p.add_argument('names', nargs='+')
+    p.set_defaults(func=cmd_delete)
+
+    p = sub.add_parser('optimize', help="缩小/重新压缩过大的样图")
+    p.add_argument('--max-side', type=int, default=artist_core.OPTIMIZE_MAX_SIDE)
+    p.add_argument('--quality', type=int, default=artist_core.OPTIMIZE_QUALITY)
+    p.set_defaults(func=cmd_optimize)
+
+    p = sub.add_parser('export', help="重新生成网页用的 JSON 清单，可同步到部署目录")
+    p.add_argument('--out', help="部署目录（只复制有变动的文件）")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser('watch', help="监视 artists.txt / images / showcase.json，变动后增量更新网页数据")
+    p.add_argument('--poll', action='store_true', help="强制使用轮询（默认 Linux 下用 inotify）")
+    p.set_defaults(func=cmd_watch)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    emit = make_printer(args.json)
+    lib = artist_core.ArtistLibrary(on_event=emit)
+    try:
+        result = args.func(lib, args)
+    except (ValueError, OSError) as e:
+        # 文件不存在 / 目录不可写等同样输出 error 事件，方便 cron 调用方解析
+        emit({'event': 'error', 'msg': str(e)})
+        if not args.json: print(f"错误: {e}", file=sys.stderr)
+        return 1
+    emit({'event': 'result', 'command': args.command, 'result': result})
+    return 2 if result.get('aborted') else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
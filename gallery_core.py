@@ -0,0 +1,119 @@
+# 图库 (showcase.json) 核心逻辑（无界面），manage_gallery.py 只负责界面
+import json
+import os
+import time
+
+import image_pack
+import showcase_index
+
+# === 配置区域 ===
+JSON_FILE = 'showcase.json'
+IMG_DIR = 'gallery_images'
+MAX_WIDTH = 1280  # 压缩后的最大宽度
+QUALITY = 85  # JPG 质量
+
+
+class GalleryStore:
+    def __init__(self, on_event=None):
+        # 和 ArtistLibrary 一样通过 on_event 回调通知前端：{'event': 'log', 'msg': ...}
+        self.on_event = on_event or (lambda ev: None)
+        # 数据内存缓存
+        self.data = []
+        self.load_data()
+
+    def log(self, msg):
+        self.on_event({'event': 'log', 'msg': msg})
+
+    def load_data(self):
+        if os.path.exists(JSON_FILE):
+            try:
+                with open(JSON_FILE, 'r', encoding='utf-8') as f:
+                    self.data = json.load(f)
+            except:
+                self.data = []
+        else:
+            self.data = []
+
+    def save_data(self):
+        with open(JSON_FILE, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        # 同步刷新画师倒排索引（只重解析改动过的条目）
+        try:
+            showcase_index.build_index(self.data)
+        except Exception as e:
+            self.log(f"索引更新失败: {e}")
+
+    def get(self, item_id):
+        return next((x for x in self.data if x['id'] == item_id), None)
+
+    def process_image(self, source_path):
+        """压缩并保存图片，返回相对路径；失败时抛出异常由前端提示"""
+        from PIL import Image
+        if not os.path.exists(IMG_DIR):
+            os.makedirs(IMG_DIR)
+        with Image.open(source_path) as img:
+            if img.mode in ("RGBA", "P"):
+                img = img.convert("RGB")
+
+            # 调整大小
+            if img.width > MAX_WIDTH:
+                new_h = int(img.height * (MAX_WIDTH / img.width))
+                img = img.resize((MAX_WIDTH, new_h), Image.Resampling.LANCZOS)
+
+            timestamp = int(time.time() * 1000)
+            filename = f"img_{timestamp}.jpg"
+            target_path = os.path.join(IMG_DIR, filename)
+
+            img.save(target_path, "JPEG", quality=QUALITY, optimize=True)
+            pack = image_pack.get_pack()
+            if pack: pack.put_file(target_path)
+            return f"{IMG_DIR}/{filename}"
+
+    def _remove_image(self, path):
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+            except:
+                pass
+        pack = image_pack.get_pack()
+        if pack: pack.delete(image_pack.pack_key(path))
+
+    def add(self, title, category, prompt, source_path):
+        img_rel_path = self.process_image(source_path)
+        new_entry = {
+            "id": int(time.time() * 1000),
+            "title": title,
+            "category": category,
+            "image": img_rel_path,
+            "prompt": prompt
+        }
+        # 新增到最前
+        self.data.insert(0, new_entry)
+        self.save_data()
+        return new_entry
+
+    def update(self, item_id, title, category, prompt, source_path=None):
+        record = self.get(item_id)
+        if not record: return None
+        record['title'] = title
+        record['prompt'] = prompt
+        record['category'] = category
+
+        # 如果用户选了新图，处理新图，删旧图
+        if source_path:
+            new_img_path = self.process_image(source_path)
+            self._remove_image(record['image'])
+            record['image'] = new_img_path
+
+        self.save_data()
+        return record
+
+    def delete(self, item_id):
+        record = self.get(item_id)
+        if not record: return False
+        # 删除本地文件
+        self._remove_image(record['image'])
+        # 删除数据
+        self.data = [x for x in self.data if x['id'] != item_id]
+        self.save_data()
+        return True
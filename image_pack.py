@@ -0,0 +1,313 @@
+import json
+import os
+import sys
+import mmap
+import struct
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# === 配置区域 ===
+PACK_FILE = 'images.pack'
+PACK_INDEX = 'images.pack.json'
+PACK_DIRS = ('images', 'gallery_images')
+INDEX_VERSION = 1
+
+# 每条记录：头部 (魔数, key 长度, 数据长度) + key + 数据；索引丢失时可顺序扫描重建
+RECORD_HEADER = struct.Struct('<4sHI')
+RECORD_MAGIC = b'NAIP'
+TOMBSTONE_MAGIC = b'NAID'  # 删除记录（数据长度为 0），重建索引时据此去掉该 key
+
+
+def pack_key(path):
+    """统一成 pack 里的 key：相对路径 + 正斜杠，如 images/10mo.jpg"""
+    return os.path.relpath(path).replace('\\', '/')
+
+
+class ImagePack:
+    """追加写入的单文件图片仓库，读取走 mmap，索引为 key -> [offset, length]
+
+    GUI、watch 和 serve 可能同时打开同一个 pack：写操作都在文件锁内进行，
+    保存索引前先合并磁盘上别的进程写入的条目；读方通过 refresh() 发现新条目"""
+
+    def __init__(self, pack_path=PACK_FILE, index_path=PACK_INDEX):
+        self.pack_path = pack_path
+        self.index_path = index_path
+        self.lock = threading.RLock()
+        self.entries = {}
+        self.pending = {}  # 尚未写入索引文件的本地改动，None 表示已删除
+        self._stamp = None  # 上次读到的索引文件 (mtime, size)
+        self._lock_depth = 0
+        self._lock_file = None
+        self._file = None
+        self._map = None
+        self.load_index()
+
+    @contextmanager
+    def _locked(self):
+        """线程锁 + 跨进程文件锁，可重入"""
+        with self.lock:
+            if self._lock_depth == 0:
+                self._lock_file = open(self.pack_path + '.lock', 'a+b')
+                if fcntl:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+                else:
+                    self._lock_file.seek(0)
+                    msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    if fcntl:
+                        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+                    else:
+                        self._lock_file.seek(0)
+                        msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    # ================= 索引 =================
+    def _index_stamp(self):
+        try:
+            st = os.stat(self.index_path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                return data['entries']
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+        return None
+
+    def _scan(self):
+        """顺序扫描 pack 得到索引（后写入的同名记录覆盖先前的，删除记录去掉 key）"""
+        entries = {}
+        if not os.path.exists(self.pack_path):
+            return entries
+        with open(self.pack_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            while True:
+                head = f.read(RECORD_HEADER.size)
+                if len(head) < RECORD_HEADER.size:
+                    break
+                magic, klen, dlen = RECORD_HEADER.unpack(head)
+                if magic not in (RECORD_MAGIC, TOMBSTONE_MAGIC):
+                    break
+                key = f.read(klen).decode('utf-8')
+                offset = f.tell()
+                f.seek(dlen, os.SEEK_CUR)
+                if f.tell() > size:
+                    break  # 末尾半截记录（写入中断），丢弃
+                if magic == TOMBSTONE_MAGIC:
+                    entries.pop(key, None)
+                else:
+                    entries[key] = [offset, dlen]
+        return entries
+
+    def _sync(self):
+        """读入磁盘索引（可能已被别的进程更新），再叠加本地未保存的改动"""
+        entries = self._read_index()
+        missing = entries is None
+        if missing:
+            entries = self._scan()
+        for key, entry in self.pending.items():
+            if entry is None:
+                entries.pop(key, None)
+            else:
+                entries[key] = entry
+        self.entries = entries
+        self._stamp = self._index_stamp()
+        self.close()  # 别的进程可能 compact 过，下次读取时重新映射
+        return missing
+
+    def _write_index(self):
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'entries': self.entries}, f, ensure_ascii=False,
+                      separators=(',', ':'))
+        os.replace(tmp, self.index_path)
+        self.pending.clear()
+        self._stamp = self._index_stamp()
+
+    def load_index(self):
+        with self._locked():
+            if self._sync() and os.path.exists(self.pack_path):
+                self._write_index()
+
+    def refresh(self):
+        """索引文件被别的进程改过时重新载入（只 stat 一次，适合每次请求前调用）"""
+        if self._index_stamp() != self._stamp:
+            with self._locked():
+                self._sync()
+        return self
+
+    def save_index(self):
+        """合并磁盘上的最新索引后写回，不会覆盖其它进程写入的条目"""
+        with self._locked():
+            self._sync()
+            self._write_index()
+
+    def rebuild_index(self):
+        """丢弃索引文件，按 pack 内容重建"""
+        with self._locked():
+            self.pending.clear()
+            self.entries = self._scan()
+            self._write_index()
+
+    # ================= 读 =================
+    def _mapped(self, end):
+        """返回覆盖到 end 的 mmap；pack 追加变长后重新映射"""
+        if self._map is None or len(self._map) < end:
+            self.close()
+            self._file = open(self.pack_path, 'rb')
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def keys(self):
+        return list(self.entries)
+
+    def size(self, key):
+        return self.entries[key][1]
+
+    def get(self, key, start=0, end=None):
+        """读取 key 的数据，start/end 为数据内的字节区间（用于 Range 请求）"""
+        with self.lock:
+            offset, length = self.entries[key]
+            end = length if end is None else min(end, length)
+            m = self._mapped(offset + length)
+            return m[offset + start:offset + end]
+
+    # ================= 写 =================
+    def _append(self, magic, key, data=b''):
+        kb = key.encode('utf-8')
+        with open(self.pack_path, 'ab') as f:
+            f.write(RECORD_HEADER.pack(magic, len(kb), len(data)) + kb)
+            offset = f.tell()
+            f.write(data)
+        return offset
+
+    def put(self, key, data, save=True):
+        with self._locked():
+            self.entries[key] = self.pending[key] = [self._append(RECORD_MAGIC, key, data), len(data)]
+            if save: self.save_index()
+
+    def put_file(self, path, key=None, save=True):
+        with open(path, 'rb') as f:
+            self.put(key or pack_key(path), f.read(), save)
+
+    def delete(self, key, save=True):
+        """写入删除记录，保证重建索引后该 key 不会复活"""
+        with self._locked():
+            self.refresh()
+            if key not in self.entries: return
+            self._append(TOMBSTONE_MAGIC, key)
+            del self.entries[key]
+            self.pending[key] = None
+            if save: self.save_index()
+
+    def compact(self):
+        """只保留仍然有效的记录（删除记录一并清除），重写 pack，返回回收的字节数
+
+        其它进程持有的旧映射在重新载入索引前会读到旧偏移，compact 最好在没有其它程序运行时执行"""
+        with self._locked():
+            self._sync()
+            before = os.path.getsize(self.pack_path) if os.path.exists(self.pack_path) else 0
+            tmp = self.pack_path + '.tmp'
+            new_entries = {}
+            with open(tmp, 'wb') as out:
+                for key in sorted(self.entries):
+                    offset, length = self.entries[key]
+                    data = self._mapped(offset + length)[offset:offset + length]
+                    kb = key.encode('utf-8')
+                    out.write(RECORD_HEADER.pack(RECORD_MAGIC, len(kb), length) + kb)
+                    new_entries[key] = [out.tell(), length]
+                    out.write(data)
+            self.close()  # Windows 下映射中的文件不能被替换
+            os.replace(tmp, self.pack_path)
+            self.entries = new_entries
+            self._write_index()
+            return before - os.path.getsize(self.pack_path)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+_default_pack = None
+
+
+def get_pack():
+    """启用了 pack（images.pack 存在）时返回共享实例，否则返回 None；每次调用都会检查索引是否被别的进程更新"""
+    global _default_pack
+    if _default_pack is None:
+        if os.path.exists(PACK_FILE):
+            _default_pack = ImagePack()
+        return _default_pack
+    return _default_pack.refresh()
+
+
+def build(dirs=PACK_DIRS):
+    """把图片目录里尚未入库或有更新的文件追加进 pack"""
+    pack = ImagePack()
+    added = 0
+    for d in dirs:
+        if not os.path.isdir(d): continue
+        for fn in sorted(os.listdir(d)):
+            path = os.path.join(d, fn)
+            key = pack_key(path)
+            if os.path.isfile(path) and (key not in pack or pack.size(key) != os.path.getsize(path)):
+                pack.put_file(path, key, save=False)
+                added += 1
+    if added: pack.save_index()
+    return pack, added
+
+
+def export(target_dir='.'):
+    """把 pack 还原成普通文件（部署到不支持 pack 的主机时使用）"""
+    pack = ImagePack()
+    for key in pack.keys():
+        path = os.path.join(target_dir, *key.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(pack.get(key))
+    return len(pack.keys())
+
+
+def serve(port=8000, host='127.0.0.1'):
+    """直接从 pack 提供图片（支持 Range 请求），具体实现见 serve.py"""
+    import serve as server
+    server.run(port, host)
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else 'build'
+    if cmd == 'build':
+        p, n = build()
+        print(f"打包完成: 新增/更新 {n} 个文件，共 {len(p.keys())} 个")
+    elif cmd == 'compact':
+        print(f"压缩完成: 回收 {ImagePack().compact() / 1024 / 1024:.2f}MB")
+    elif cmd == 'export':
+        print(f"导出 {export(sys.argv[2] if len(sys.argv) > 2 else '.')} 个文件")
+    elif cmd == 'serve':
+        serve(int(sys.argv[2]) if len(sys.argv) > 2 else 8000)
+    else:
+        print("用法: python image_pack.py [build|compact|export <dir>|serve <port>]")
@@ -1,22 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from PIL import Image, ImageTk
-import json
 import os
-import time
-import shutil
+from gallery_core import GalleryStore
 
 # === 配置区域 ===
-JSON_FILE = 'showcase.json'
-IMG_DIR = 'gallery_images'
-MAX_WIDTH = 1280  # 压缩后的最大宽度
-QUALITY = 85  # JPG 质量
 WINDOW_TITLE = "NovelAI 图库管理器"
 
-# 确保目录存在
-if not os.path.exists(IMG_DIR):
-    os.makedirs(IMG_DIR)
-
 
 class GalleryManager:
     def __init__(self, root):
@@ -24,9 +14,8 @@ class GalleryManager:
         self.root.title(WINDOW_TITLE)
         self.root.geometry("1000x600")
 
-        # 数据内存缓存
-        self.data = []
-        self.load_data()
+        # 数据与图片处理都在 GalleryStore 里，这里只管界面
+        self.store = GalleryStore(on_event=self.on_store_event)
 
         # 当前选中的图片路径（用于新增或修改）
         self.temp_image_path = None
@@ -35,19 +24,9 @@ class GalleryManager:
         self.setup_ui()
         self.refresh_list()
 
-    def load_data(self):
-        if os.path.exists(JSON_FILE):
-            try:
-                with open(JSON_FILE, 'r', encoding='utf-8') as f:
-                    self.data = json.load(f)
-            except:
-                self.data = []
-        else:
-            self.data = []
-
-    def save_data(self):
-        with open(JSON_FILE, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
+    def on_store_event(self, ev):
+        if ev['event'] == 'log':
+            messagebox.showwarning("提示", ev['msg'])
 
     def setup_ui(self):
         # === 布局 ===
@@ -129,7 +108,7 @@ class GalleryManager:
             self.tree.delete(item)
 
         # 重新填充
-        for item in self.data:
+        for item in self.store.data:
             display_cat = "精选图" if item['category'] == 'run' else "画师串"
             self.tree.insert("", "end", iid=str(item['id']), values=(item['title'], display_cat))
 
@@ -161,7 +140,7 @@ class GalleryManager:
 
         item_id = int(selected[0])
         # 查找数据
-        record = next((x for x in self.data if x['id'] == item_id), None)
+        record = self.store.get(item_id)
         if record:
             self.current_editing_id = item_id
 
@@ -193,28 +172,6 @@ class GalleryManager:
         self.btn_save.config(text="💾 保存新增", bg="#2ecc71")
         self.tree.selection_remove(self.tree.selection())
 
-    def process_image(self, source_path):
-        """压缩并保存图片，返回相对路径"""
-        try:
-            with Image.open(source_path) as img:
-                if img.mode in ("RGBA", "P"):
-                    img = img.convert("RGB")
-
-                # 调整大小
-                if img.width > MAX_WIDTH:
-                    new_h = int(img.height * (MAX_WIDTH / img.width))
-                    img = img.resize((MAX_WIDTH, new_h), Image.Resampling.LANCZOS)
-
-                timestamp = int(time.time() * 1000)
-                filename = f"img_{timestamp}.jpg"
-                target_path = os.path.join(IMG_DIR, filename)
-
-                img.save(target_path, "JPEG", quality=QUALITY, optimize=True)
-                return f"{IMG_DIR}/{filename}"
-        except Exception as e:
-            messagebox.showerror("错误", f"图片处理失败: {e}")
-            return None
-
     def save_item(self):
         title = self.entry_title.get().strip()
         prompt = self.txt_prompt.get("1.0", tk.END).strip()
@@ -224,54 +181,26 @@ class GalleryManager:
             messagebox.showwarning("提示", "标题不能为空")
             return
 
-        # === 模式 A: 修改现有条目 ===
-        if self.current_editing_id is not None:
-            # 找到原始数据
-            record = next((x for x in self.data if x['id'] == self.current_editing_id), None)
-            if record:
-                record['title'] = title
-                record['prompt'] = prompt
-                record['category'] = category
-
-                # 如果用户选了新图，处理新图，删旧图
-                if self.temp_image_path:
-                    new_img_path = self.process_image(self.temp_image_path)
-                    if new_img_path:
-                        # 尝试删除旧图
-                        if os.path.exists(record['image']):
-                            try:
-                                os.remove(record['image'])
-                            except:
-                                pass
-                        record['image'] = new_img_path
-
-                self.save_data()
-                self.refresh_list()
-                messagebox.showinfo("成功", "修改已保存")
-                self.clear_form()  # 保存后清空，方便下一次
-
-        # === 模式 B: 新增条目 ===
-        else:
-            if not self.temp_image_path:
-                messagebox.showwarning("提示", "请选择一张图片")
-                return
-
-            img_rel_path = self.process_image(self.temp_image_path)
-            if img_rel_path:
-                new_id = int(time.time() * 1000)
-                new_entry = {
-                    "id": new_id,
-                    "title": title,
-                    "category": category,
-                    "image": img_rel_path,
-                    "prompt": prompt
-                }
-                # 新增到最前
-                self.data.insert(0, new_entry)
-                self.save_data()
+        try:
+            # === 模式 A: 修改现有条目 ===
+            if self.current_editing_id is not None:
+                if self.store.update(self.current_editing_id, title, category, prompt, self.temp_image_path):
+                    self.refresh_list()
+                    messagebox.showinfo("成功", "修改已保存")
+                    self.clear_form()  # 保存后清空，方便下一次
+
+            # === 模式 B: 新增条目 ===
+            else:
+                if not self.temp_image_path:
+                    messagebox.showwarning("提示", "请选择一张图片")
+                    return
+
+                self.store.add(title, category, prompt, self.temp_image_path)
                 self.refresh_list()
                 self.clear_form()
                 messagebox.showinfo("成功", "添加成功")
+        except Exception as e:
+            messagebox.showerror("错误", f"图片处理失败: {e}")
 
     def delete_item(self):
         selected = self.tree.selection()
@@ -280,20 +209,7 @@ class GalleryManager:
         if not messagebox.askyesno("确认", "确定要删除这条记录吗？\n(关联的图片文件也会被删除)"):
             return
 
-        item_id = int(selected[0])
-        record = next((x for x in self.data if x['id'] == item_id), None)
-
-        if record:
-            # 删除本地文件
-            if os.path.exists(record['image']):
-                try:
-                    os.remove(record['image'])
-                except:
-                    pass
-
-            # 删除数据
-            self.data = [x for x in self.data if x['id'] != item_id]
-            self.save_data()
+        if self.store.delete(int(selected[0])):
             self.refresh_list()
             self.clear_form()
 
@@ -0,0 +1,342 @@
+import os
+import sys
+import gzip
+import argparse
+import json
+import time
+import hashlib
+import mimetypes
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import unquote, urlsplit, parse_qs
+
+import image_pack
+
+# === 配置区域 ===
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HOST = '127.0.0.1'  # 默认只在本机可访问，对外提供服务时用 --host 0.0.0.0
+DEFAULT_PORT = 8000
+# 只提供网页需要的文件：config.json（含 API Key）、源码、.git 等一律 404
+SERVE_FILES = {'index.html', 'gallery.html', 'artist_data.json', 'showcase.json', 'showcase_index.json',
+               'similar_artists.json'}
+SERVE_DIRS = ('images', 'gallery_images')
+STREAM_CHUNK = 256 * 1024
+COMPRESS_EXTS = {'.html', '.json', '.js', '.css', '.txt'}
+# 清单里的图片路径会被加上 ?v=版本号，带版本号的请求可以长期缓存
+MANIFESTS = {'artist_data.json', 'showcase.json'}
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+
+def allowed(rel):
+    """rel 是否在允许提供的范围内（白名单文件，或图片目录下的非隐藏文件）"""
+    if '\\' in rel or ':' in rel:
+        return False
+    parts = rel.split('/')
+    if any(not p or p.startswith('.') for p in parts):
+        return False
+    if len(parts) == 1:
+        return rel in SERVE_FILES
+    return len(parts) == 2 and parts[0] in SERVE_DIRS
+
+
+class Asset:
+    """文本资源（页面 / JSON 清单）：内容常驻内存 + 预压缩内容 + 强 ETag"""
+
+    def __init__(self, body, ctype, stamp, compress=False):
+        self.body = body
+        self.size = len(body)
+        self.ctype = ctype
+        self.stamp = stamp  # 用于判断磁盘文件是否变动
+        self.etag = '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+        self.gz = None
+        self.gz_etag = self.etag[:-1] + '-gz"'  # 强 ETag 要区分不同编码的表示
+        if compress:
+            gz = gzip.compress(body, 9)
+            if len(gz) < len(body):
+                self.gz = gz
+
+    def read(self, start, end):
+        yield self.body[start:end]
+
+
+class FileAsset:
+    """图片：不缓存内容，磁盘文件分块流式读取，pack 里的按区间直接读 mmap"""
+    gz = None
+
+    def __init__(self, ctype, stamp, size, path=None, pack=None, key=None):
+        self.ctype = ctype
+        self.stamp = stamp
+        self.size = size
+        self.path, self.pack, self.key = path, pack, key
+        self.etag = self.gz_etag = '"%x-%x"' % stamp
+
+    def read(self, start, end):
+        if self.path is None:
+            for pos in range(start, end, STREAM_CHUNK):
+                yield self.pack.get(self.key, pos, min(pos + STREAM_CHUNK, end))
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            left = end - start
+            while left > 0:
+                chunk = f.read(min(STREAM_CHUNK, left))
+                if not chunk: break
+                left -= len(chunk)
+                yield chunk
+
+
+class AssetStore:
+    """按 (mtime, size) 缓存文本资源；清单 JSON 会被重写成带版本号的图片链接，图片不进缓存"""
+
+    def __init__(self, root=ROOT_DIR):
+        self.root = root
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def version(self, rel):
+        """图片的版本号：本地文件取 mtime+size，pack 里取 offset+size"""
+        path = os.path.join(self.root, *rel.split('/'))
+        if os.path.isfile(path):
+            st = os.stat(path)
+            return '%x%x' % (st.st_mtime_ns // 1000000, st.st_size)
+        pack = image_pack.get_pack()
+        if pack and rel in pack:
+            return '%x%x' % tuple(pack.entries[rel])
+        return None
+
+    def _rewrite_manifest(self, body):
+        data = json.loads(body)
+        for item in data:
+            img = item.get('image')
+            if not img: continue
+            rel = img.replace('\\', '/')
+            v = self.version(rel)
+            item['image'] = f"{rel}?v={v}" if v else rel
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def get(self, rel):
+        """rel 为正斜杠相对路径，找不到或不允许访问时返回 None"""
+        if not allowed(rel):
+            return None
+        path = os.path.join(self.root, *rel.split('/'))
+        ctype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if os.path.splitext(rel)[1].lower() not in COMPRESS_EXTS:
+            return self._get_binary(rel, path, ctype)
+        with self.lock:
+            asset = self.cache.get(rel)
+        if os.path.isfile(path):
+            st = os.stat(path)
+            stamp = (st.st_mtime_ns, st.st_size)
+            if rel in MANIFESTS:
+                # 清单里的版本号随图片变化，每次重写（几毫秒），内容不变时复用已压缩的结果
+                with open(path, 'rb') as f:
+                    body = f.read()
+                try:
+                    body = self._rewrite_manifest(body)
+                except ValueError:
+                    pass
+                stamp = hashlib.sha1(body).digest()
+            elif asset and asset.stamp == stamp:
+                return asset
+            else:
+                with open(path, 'rb') as f:
+                    body = f.read()
+            if asset and asset.stamp == stamp:
+                return asset
+        else:
+            pack = image_pack.get_pack()
+            if not pack or rel not in pack:
+                return None
+            stamp = tuple(pack.entries[rel])
+            if asset and asset.stamp == stamp:
+                return asset
+            body = pack.get(rel)
+        if ctype.startswith('text/') or ctype.endswith('json') or ctype.endswith('javascript'):
+            ctype += '; charset=utf-8'
+        asset = Asset(body, ctype, stamp, compress=True)
+        with self.lock:
+            self.cache[rel] = asset
+        return asset
+
+    def _get_binary(self, rel, path, ctype):
+        if os.path.isfile(path):
+            st = os.stat(path)
+            return FileAsset(ctype, (st.st_mtime_ns, st.st_size), st.st_size, path=path)
+        pack = image_pack.get_pack()
+        if not pack or rel not in pack:
+            return None
+        offset, length = pack.entries[rel]
+        return FileAsset(ctype, (offset, length), length, pack=pack, key=rel)
+
+
+class CachingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive，一个页面的几百张图复用连接
+    store = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_HEAD(self):
+        self.handle_get(head=True)
+
+    def do_GET(self):
+        self.handle_get()
+
+    def send_plain(self, code, extra=None):
+        self.send_response(code)
+        for k, v in (extra or {}).items():
+            self.send_header(k, v)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def handle_get(self, head=False):
+        url = urlsplit(self.path)
+        rel = unquote(url.path).lstrip('/') or 'index.html'
+        asset = self.store.get(rel)
+        if asset is None:
+            return self.send_plain(404)
+
+        # 带 ?v= 且与当前版本一致的资源视为哈希化资源，长期缓存
+        v = parse_qs(url.query).get('v', [None])[0]
+        hashed = v is not None and v == self.store.version(rel)
+        headers = {
+            'ETag': asset.etag,
+            'Cache-Control': IMMUTABLE_CACHE if hashed else REVALIDATE_CACHE,
+            'Accept-Ranges': 'bytes',
+        }
+        if asset.gz is not None:
+            headers['Vary'] = 'Accept-Encoding'
+
+        inm = self.headers.get('If-None-Match')
+        gzip_ok = asset.gz is not None and 'gzip' in self.headers.get('Accept-Encoding', '')
+        if gzip_ok: headers['ETag'] = asset.gz_etag
+        if inm:
+            tags = [t.strip() for t in inm.split(',')]
+            if '*' in tags or asset.etag in tags or asset.gz_etag in tags:
+                return self.send_plain(304, headers)
+
+        code = 200
+        start, end = 0, asset.size
+        gz_body = None
+        rng = self.headers.get('Range')
+        if_range = self.headers.get('If-Range')
+        if rng and (not if_range or if_range == asset.etag):
+            headers['ETag'] = asset.etag
+            span = parse_range(rng, asset.size)
+            if span is None:
+                headers['Content-Range'] = f'bytes */{asset.size}'
+                return self.send_plain(416, headers)
+            if span:
+                start, end = span
+                headers['Content-Range'] = f'bytes {start}-{end - 1}/{asset.size}'
+                code = 206
+        elif gzip_ok:
+            headers['Content-Encoding'] = 'gzip'
+            gz_body = asset.gz
+
+        self.send_response(code)
+        headers['Content-Type'] = asset.ctype
+        headers['Content-Length'] = str(len(gz_body) if gz_body is not None else end - start)
+        for k, val in headers.items():
+            self.send_header(k, val)
+        self.end_headers()
+        if head: return
+        if gz_body is not None:
+            self.wfile.write(gz_body)
+        else:
+            for chunk in asset.read(start, end):
+                self.wfile.write(chunk)
+
+
+def parse_range(header, size):
+    """解析单段 Range 头，返回 (start, end)；无法满足返回 None，格式不认识返回 ()"""
+    if not header.startswith('bytes=') or ',' in header:
+        return ()
+    a, _, b = header[6:].strip().partition('-')
+    try:
+        if a:
+            start, end = int(a), (int(b) + 1 if b else size)
+        elif b:
+            start, end = max(size - int(b), 0), size
+        else:
+            return ()
+    except ValueError:
+        return ()
+    if start >= size or start >= end:
+        return None
+    return start, min(end, size)
+
+
+def make_server(port=DEFAULT_PORT, root=ROOT_DIR, host=DEFAULT_HOST):
+    handler = type('Handler', (CachingHandler,), {'store': AssetStore(root)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def run(port=DEFAULT_PORT, host=DEFAULT_HOST):
+    server = make_server(port, host=host)
+    print(f"Serving on http://{host or '0.0.0.0'}:{server.server_address[1]}/  (Ctrl+C 退出)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+# ================= 本地压测 =================
+def _page_urls(conn, page, manifest):
+    """模拟一次完整页面加载需要请求的 URL 列表"""
+    conn.request('GET', '/' + manifest)
+    data = json.loads(conn.getresponse().read())
+    return ['/' + page, '/' + manifest] + ['/' + item['image'] for item in data if item.get('image')]
+
+
+def bench(clients=8, rounds=3, page='index.html', manifest='artist_data.json'):
+    """起一个本地服务器，用 clients 个并发连接完整加载页面 rounds 次，统计 req/s"""
+    server = make_server(0)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    urls = _page_urls(http.client.HTTPConnection('127.0.0.1', port), page, manifest)
+    chunks = [urls[i::clients] for i in range(clients)]
+
+    def worker(chunk, etags):
+        conn = http.client.HTTPConnection('127.0.0.1', port)
+        n = 0
+        for u in chunk:
+            headers = {'Accept-Encoding': 'gzip'}
+            if u in etags: headers['If-None-Match'] = etags[u]
+            conn.request('GET', u, headers=headers)
+            r = conn.getresponse()
+            r.read()
+            etags[u] = r.getheader('ETag')
+            n += 1
+        conn.close()
+        return n
+
+    etags = {}
+    worker(urls, etags)  # 预热服务端缓存，同时记下 ETag 供复访使用
+    for label, known in (('首次加载', {}), ('304 复访', etags)):
+        t0 = time.perf_counter()
+        total = 0
+        for _ in range(rounds):
+            with ThreadPoolExecutor(clients) as ex:
+                total += sum(ex.map(lambda c: worker(c, dict(known)), chunks))
+        dt = time.perf_counter() - t0
+        print(f"{label}: {rounds} 次页面加载 × {len(urls)} 请求，{clients} 并发 -> "
+              f"{total / dt:.0f} req/s, {rounds / dt:.2f} 页/s")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        bench(*(int(x) for x in sys.argv[2:4]))
+    else:
+        parser = argparse.ArgumentParser(description="本地静态服务器（带缓存/压缩/Range），压测用 python serve.py bench")
+        parser.add_argument('port', nargs='?', type=int, default=DEFAULT_PORT)
+        parser.add_argument('--host', default=DEFAULT_HOST, help="监听地址，局域网/公网访问用 0.0.0.0")
+        args = parser.parse_args()
+        run(args.port, args.host)
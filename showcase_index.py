@@ -0,0 +1,163 @@
+import json
+import os
+import re
+import hashlib
+
+# === 配置区域 ===
+SHOWCASE_FILE = 'showcase.json'
+DATA_FILE = 'artist_data.json'
+ARTIST_FILE = 'artists.txt'
+INDEX_FILE = 'showcase_index.json'
+INDEX_VERSION = 2  # 解析规则变动时递增，强制全部重新解析
+
+# NAI 语法：{} 每层 ×1.05，[] 每层 ÷1.05，"-2::xxx::" / "0.5::xxx::" 为显式权重（可跨逗号）
+EMPHASIS_STEP = 1.05
+_TOKEN_RE = re.compile(r'(-?\d+(?:\.\d+)?)::|::|[{}\[\],，\n]|(?:(?!-?\d+(?:\.\d+)?::)[^{}\[\],，\n:])+|:')
+
+
+def parse_prompt(text):
+    """把一段 NAI 提示词拆成 [(tag, weight), ...]，weight 为最终生效的倍率"""
+    results = []
+    brackets = []  # 尚未闭合的 { / [，多余或不配对的右括号直接忽略
+    weight_stack = []
+    buf = []
+
+    def flush():
+        tag = ''.join(buf).strip()
+        buf.clear()
+        if tag:
+            base = weight_stack[-1] if weight_stack else 1.0
+            depth = brackets.count('{') - brackets.count('[')
+            results.append((tag, round(base * EMPHASIS_STEP ** depth, 3)))
+
+    for m in _TOKEN_RE.finditer(text or ''):
+        tok = m.group()
+        if m.group(1) is not None:
+            flush()
+            weight_stack.append(float(m.group(1)))
+        elif tok == '::':
+            flush()
+            if weight_stack: weight_stack.pop()
+        elif tok in '{[':
+            flush()
+            brackets.append(tok)
+        elif tok in '}]':
+            flush()
+            if brackets and brackets[-1] == ('{' if tok == '}' else '['):
+                brackets.pop()
+        elif tok in ',，\n':
+            flush()
+        else:
+            buf.append(tok)
+    flush()
+    return results
+
+
+def normalize_tag(tag):
+    """统一成画师库里的写法：小写、去 artist: 前缀、空格转下划线、去转义"""
+    tag = tag.lower().strip().replace('\\', '')
+    explicit = tag.startswith('artist:')
+    if explicit:
+        tag = tag[len('artist:'):].strip()
+    return re.sub(r'\s+', '_', tag), explicit
+
+
+def load_catalog():
+    """读取画师库（artist_data.json + artists.txt），返回名字集合"""
+    names = set()
+    if os.path.exists(DATA_FILE):
+        try:
+            with open(DATA_FILE, 'r', encoding='utf-8') as f:
+                names.update(item['name'] for item in json.load(f))
+        except:
+            pass
+    if os.path.exists(ARTIST_FILE):
+        with open(ARTIST_FILE, 'r', encoding='utf-8') as f:
+            names.update(x.strip().lower() for x in f if x.strip())
+    return names
+
+
+def resolve_prompt(text, catalog):
+    """解析提示词并对照画师库，返回 (命中的 [(name, weight)], 未收录的 artist: 标签)"""
+    found, unresolved = [], []
+    for tag, weight in parse_prompt(text):
+        name, explicit = normalize_tag(tag)
+        if name in catalog:
+            found.append((name, weight))
+        elif explicit and name:
+            unresolved.append(name)
+    return found, unresolved
+
+
+def _hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def load_index(path=INDEX_FILE):
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') == INDEX_VERSION:
+                return index
+        except:
+            pass
+    return {}
+
+
+def build_index(showcase=None, catalog=None, path=INDEX_FILE):
+    """增量构建倒排索引：只重新解析 prompt 变动过的条目；画师库变动时全部重解析"""
+    if showcase is None:
+        with open(SHOWCASE_FILE, 'r', encoding='utf-8') as f:
+            showcase = json.load(f)
+    if catalog is None:
+        catalog = load_catalog()
+
+    old = load_index(path)
+    catalog_hash = _hash('\n'.join(sorted(catalog)))
+    old_entries = old.get('entries', {}) if old.get('catalog') == catalog_hash else {}
+
+    entries = {}
+    reparsed = 0
+    for item in showcase:
+        key = str(item['id'])
+        h = _hash(item.get('prompt', ''))
+        cached = old_entries.get(key)
+        if cached and cached['hash'] == h:
+            entries[key] = cached
+            continue
+        found, unresolved = resolve_prompt(item.get('prompt', ''), catalog)
+        entries[key] = {'hash': h, 'artists': found, 'unresolved': unresolved}
+        reparsed += 1
+
+    # 倒排：artist -> 出现的 showcase id / 次数 / 常用权重
+    artists = {}
+    for key, entry in entries.items():
+        for name, weight in entry['artists']:
+            rec = artists.setdefault(name, {'showcases': [], 'uses': 0, 'weights': []})
+            if not rec['showcases'] or rec['showcases'][-1] != int(key):
+                rec['showcases'].append(int(key))
+            rec['uses'] += 1
+            rec['weights'].append(weight)
+    for rec in artists.values():
+        ws = sorted(rec.pop('weights'))
+        rec['count'] = len(rec['showcases'])
+        rec['weight'] = ws[len(ws) // 2]
+
+    index = {
+        'version': INDEX_VERSION,
+        'catalog': catalog_hash,
+        'artists': dict(sorted(artists.items())),
+        'entries': entries,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    return index, reparsed
+
+
+if __name__ == "__main__":
+    idx, n = build_index()
+    print(f"索引完成: {len(idx['entries'])} 个作品 (重新解析 {n})，命中 {len(idx['artists'])} 位画师")
+    unknown = sorted({u for e in idx['entries'].values() for u in e['unresolved']})
+    if unknown:
+        print("未收录的 artist: 标签:", ", ".join(unknown))
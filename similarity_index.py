@@ -0,0 +1,187 @@
+import io
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+import image_pack
+
+# === 配置区域 ===
+DATA_FILE = 'artist_data.json'
+FEATURE_CACHE = 'style_features.npz'  # 每张样图的特征向量缓存，按 mtime/size 增量更新
+OUTPUT_FILE = 'similar_artists.json'  # 网页用：画师 -> 最相似的 TOP_K 位画师
+THUMB = 32  # 特征提取用的缩略图边长
+TOP_K = 8
+FEATURE_DIM = 72 + 64 + 10  # 颜色直方图 + 亮度缩略图 + 梯度统计
+BATCH = 256  # 解码和相似度矩阵都分块处理，避免几千张图时占用过多内存
+DECODE_WORKERS = min(8, os.cpu_count() or 1)  # PIL 解码时释放 GIL，多线程可并行
+
+# 各类特征在拼接前的权重
+W_COLOR, W_LUMA, W_EDGE = 1.0, 0.6, 0.8
+
+
+def _stamp(path):
+    if os.path.exists(path):
+        st = os.stat(path)
+        return f"{st.st_mtime_ns}-{st.st_size}"
+    pack = image_pack.get_pack()
+    key = image_pack.pack_key(path)
+    if pack and key in pack:
+        return "pack-%d-%d" % tuple(pack.entries[key])
+    return None
+
+
+def load_thumb(path):
+    """读取样图并缩成 THUMB x THUMB 的 RGB 数组；JPEG 用 draft 模式在解码时直接降采样"""
+    if os.path.exists(path):
+        img = Image.open(path)
+    else:
+        img = Image.open(io.BytesIO(image_pack.get_pack().get(image_pack.pack_key(path))))
+    img.draft('RGB', (THUMB * 2, THUMB * 2))
+    img = img.convert('RGB').resize((THUMB, THUMB), Image.Resampling.BILINEAR)
+    return np.asarray(img, dtype=np.uint8)
+
+
+def _normalize(x):
+    return x / (np.linalg.norm(x, axis=1, keepdims=True) + 1e-8)
+
+
+def extract_features(thumbs):
+    """thumbs: (N, THUMB, THUMB, 3) uint8 -> (N, D) float32，整批向量化计算"""
+    x = thumbs.astype(np.float32) / 255.0
+    n = len(x)
+    r, g, b = x[..., 0], x[..., 1], x[..., 2]
+
+    # 1. 颜色：HSV 联合直方图 (色相 8 × 饱和度 3 × 明度 3)
+    mx, mn = x.max(-1), x.min(-1)
+    delta = mx - mn
+    safe = np.where(delta == 0, 1, delta)
+    hue = np.select([mx == r, mx == g], [((g - b) / safe) % 6, (b - r) / safe + 2], (r - g) / safe + 4) / 6
+    sat = np.where(mx == 0, 0, delta / np.where(mx == 0, 1, mx))
+    bins = (np.minimum((hue * 8).astype(int), 7) * 9
+            + np.minimum((sat * 3).astype(int), 2) * 3
+            + np.minimum((mx * 3).astype(int), 2))
+    color = np.zeros((n, 72), np.float32)
+    np.add.at(color, (np.repeat(np.arange(n), THUMB * THUMB), bins.reshape(-1)), 1)
+    color = np.sqrt(color)  # Hellinger 距离，弱化大面积背景色
+
+    # 2. 构图：8x8 亮度缩略图，去均值后只看明暗分布
+    luma = 0.299 * r + 0.587 * g + 0.114 * b
+    small = luma.reshape(n, 8, THUMB // 8, 8, THUMB // 8).mean(axis=(2, 4)).reshape(n, -1)
+    small -= small.mean(axis=1, keepdims=True)
+
+    # 3. 线条：梯度方向直方图 (8 方向，按梯度强度加权) + 平均梯度强度/对比度
+    gx = np.zeros_like(luma)
+    gy = np.zeros_like(luma)
+    gx[:, :, 1:-1] = luma[:, :, 2:] - luma[:, :, :-2]
+    gy[:, 1:-1, :] = luma[:, 2:, :] - luma[:, :-2, :]
+    mag = np.hypot(gx, gy)
+    ori = np.minimum(((np.arctan2(gy, gx) % np.pi) / np.pi * 8).astype(int), 7)
+    edge = np.zeros((n, 8), np.float32)
+    np.add.at(edge, (np.repeat(np.arange(n), THUMB * THUMB), ori.reshape(-1)), mag.reshape(-1))
+    edge = np.hstack([_normalize(edge), mag.mean(axis=(1, 2))[:, None] * 4, luma.std(axis=(1, 2))[:, None] * 2])
+
+    feats = np.hstack([W_COLOR * _normalize(color), W_LUMA * _normalize(small), W_EDGE * _normalize(edge)])
+    return _normalize(feats).astype(np.float32)
+
+
+def load_cache():
+    if os.path.exists(FEATURE_CACHE):
+        try:
+            z = np.load(FEATURE_CACHE, allow_pickle=False)
+            return {n: (s, f) for n, s, f in zip(z['names'], z['stamps'], z['feats'])}
+        except Exception:
+            pass
+    return {}
+
+
+def save_cache(names, stamps, feats):
+    with open(FEATURE_CACHE, 'wb') as f:  # 用文件对象，避免 np.savez 自动追加扩展名
+        np.savez(f, names=np.array(names), stamps=np.array(stamps), feats=feats)
+
+
+def top_k(feats, k=TOP_K):
+    """余弦相似度暴力近邻，分块计算；返回 (idx, score) 两个 (N, k) 数组"""
+    n = len(feats)
+    k = min(k, n - 1)
+    idx = np.zeros((n, k), np.int64)
+    score = np.zeros((n, k), np.float32)
+    for s in range(0, n, BATCH):
+        sim = feats[s:s + BATCH] @ feats.T
+        rows = np.arange(len(sim))
+        sim[rows, s + rows] = -np.inf  # 排除自身
+        part = np.argpartition(-sim, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(sim, part, 1), axis=1)
+        idx[s:s + BATCH] = np.take_along_axis(part, order, 1)
+        score[s:s + BATCH] = np.take_along_axis(sim, idx[s:s + BATCH], 1)
+    return idx, score
+
+
+def build_index(log=print):
+    """增量构建：只为新增/变动的样图提取特征，然后重算近邻并导出 similar_artists.json"""
+    t0 = time.time()
+    with open(DATA_FILE, 'r', encoding='utf-8') as f:
+        items = [x for x in json.load(f) if x.get('image')]
+
+    cache = load_cache()
+    names, stamps, todo = [], [], []
+    for item in items:
+        path = item['image'].replace('\\', '/')
+        stamp = _stamp(path)
+        if stamp is None: continue
+        names.append(item['name'])
+        stamps.append(stamp)
+        cached = cache.get(item['name'])
+        if not cached or cached[0] != stamp:
+            todo.append((len(names) - 1, path))
+
+    feats = np.zeros((len(names), FEATURE_DIM), np.float32)
+    for i, name in enumerate(names):
+        if name in cache and cache[name][0] == stamps[i]:
+            feats[i] = cache[name][1]
+
+    def safe_load(path):
+        try:
+            return load_thumb(path)
+        except Exception as e:
+            log(f"跳过 {path}: {e}")
+            return None
+
+    # 新图按批并行解码，整批提取特征
+    failed = set()
+    with ThreadPoolExecutor(DECODE_WORKERS) as ex:
+        for s in range(0, len(todo), BATCH):
+            batch = todo[s:s + BATCH]
+            chunk, thumbs = [], []
+            for (i, _), thumb in zip(batch, ex.map(safe_load, [p for _, p in batch])):
+                if thumb is None:
+                    failed.add(i)
+                else:
+                    chunk.append(i)
+                    thumbs.append(thumb)
+            if thumbs:
+                feats[chunk] = extract_features(np.stack(thumbs))
+
+    keep = [i for i in range(len(names)) if i not in failed]
+    names = [names[i] for i in keep]
+    stamps = [stamps[i] for i in keep]
+    feats = feats[keep]
+    save_cache(names, stamps, feats)
+
+    result = {}
+    if len(names) > 1:
+        idx, score = top_k(feats)
+        for i, name in enumerate(names):
+            result[name] = [[names[j], round(float(sc), 3)] for j, sc in zip(idx[i], score[i])]
+    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, separators=(',', ':'))
+
+    log(f"相似度索引完成: {len(names)} 位画师，新提取 {len(todo) - len(failed)} 张，耗时 {time.time() - t0:.2f}s")
+    return result
+
+
+if __name__ == "__main__":
+    build_index()
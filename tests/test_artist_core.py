@@ -0,0 +1,124 @@
+import pytest
+
+import artist_core
+from artist_core import ArtistLibrary, CircuitBreaker, BACKOFF_BASE, BACKOFF_MAX, MAX_OUTAGE_RETRIES, parse_import
+
+
+def test_breaker_trips_on_threshold():
+    breaker = CircuitBreaker(window=5, threshold=3)
+    assert not breaker.record('transient')
+    assert not breaker.record('throttle')
+    assert not breaker.record('artist')  # 画师自身的失败不计入
+    assert breaker.record('transient')
+
+
+def test_breaker_window_slides():
+    breaker = CircuitBreaker(window=3, threshold=2)
+    breaker.record('transient')
+    breaker.record(None)
+    breaker.record(None)
+    assert not breaker.record('transient')  # 第一次故障已滑出窗口
+
+
+def test_breaker_backoff_grows_and_resets(monkeypatch):
+    monkeypatch.setattr(artist_core.random, 'uniform', lambda a, b: 1.0)
+    breaker = CircuitBreaker(window=4, threshold=2)
+    delays = [breaker.backoff() for _ in range(3)]
+    assert delays == [BACKOFF_BASE, BACKOFF_BASE * 2, BACKOFF_BASE * 4]
+    assert not breaker.recent  # 熔断后窗口清空，重新统计
+    for _ in range(20): breaker.backoff()
+    assert breaker.backoff() == BACKOFF_MAX
+    breaker.record(None)
+    assert breaker.trips == 0
+
+
+def test_parse_import_dedupes_and_understands_prompt_syntax():
+    raw = "artist:wlop, {{artist:Mika Pikazo}}; [10mo]\n1.2::ask_(askzy), wlop::；WLOP, ,"
+    assert parse_import(raw) == ['wlop', 'mika_pikazo', '10mo', 'ask_(askzy)']
+
+
+def _variant(kind, w, h, ext='jpg'):
+    return {'type': kind, 'url': f'https://cdn/{kind}.{ext}', 'width': w, 'height': h, 'file_ext': ext}
+
+
+@pytest.fixture
+def lib(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return ArtistLibrary()
+
+
+def test_pick_variant_smallest_adequate(lib):
+    post = {'media_asset': {'variants': [
+        _variant('180x180', 127, 180), _variant('360x360', 254, 360), _variant('720x720', 508, 720, 'webp'),
+        _variant('sample', 600, 850), _variant('original', 1414, 2000), _variant('crop', 150, 150)]}}
+    # 720 的 webp 不收，360 不够大，选 sample
+    assert lib._pick_variant(post) == 'https://cdn/sample.jpg'
+    post['media_asset']['variants'].append(_variant('720x720', 508, 720))
+    assert lib._pick_variant(post) == 'https://cdn/720x720.jpg'
+
+
+def test_pick_variant_never_returns_crop_or_original(lib):
+    post = {'media_asset': {'variants': [_variant('crop', 1000, 1000), _variant('original', 3000, 3000),
+                                         _variant('360x360', 360, 360)]}}
+    assert lib._pick_variant(post) is None
+
+
+def test_pick_variant_tiny_original_falls_back(lib):
+    post = {'media_asset': {'variants': [_variant('180x180', 180, 120), _variant('360x360', 300, 200),
+                                         _variant('original', 300, 200)]}}
+    assert lib._pick_variant(post) is None
+    assert lib._pick_variant({}) is None
+    assert lib._pick_variant({'media_asset': None}) is None
+
+
+@pytest.fixture
+def update_lib(lib, monkeypatch):
+    """两位画师，网络请求和等待全部替换掉，记录每次 _fetch / _dl 调用"""
+    monkeypatch.setattr(artist_core.time, 'sleep', lambda s: None)
+    lib.artists = ['alice', 'bob']
+    lib.fetches, lib.downloads = [], []
+    return lib
+
+
+def stub_network(lib, fetch_result, dl_result=(True, None)):
+    def fetch(t, ex, u, k, limit=10):
+        lib.fetches.append(t)
+        return fetch_result
+    def dl(url, path):
+        lib.downloads.append(path)
+        return dl_result
+    lib._fetch, lib._dl = fetch, dl
+
+
+def test_update_fatal_aborts_immediately(update_lib):
+    stub_network(update_lib, (None, "API 401: 认证失败", 'fatal'))
+    stats = update_lib.update('u', 'k')
+    assert stats['aborted'] == "API 401: 认证失败"
+    assert update_lib.fetches == ['alice']
+    assert stats['fail'] == []
+    assert sorted(stats['outage']) == ['alice', 'bob']  # 未处理的画师下次重试
+
+
+def test_update_requeues_transient_failures(update_lib):
+    stub_network(update_lib, (None, "API 503: 服务不可用", 'transient'))
+    stats = update_lib.update('u', 'k')
+    assert stats['aborted'] is None
+    assert update_lib.fetches.count('alice') == MAX_OUTAGE_RETRIES + 1
+    assert update_lib.fetches.count('bob') == MAX_OUTAGE_RETRIES + 1
+    assert stats['fail'] == []
+    assert sorted(stats['outage']) == ['alice', 'bob']
+
+
+def test_update_requeues_cdn_outage(update_lib):
+    stub_network(update_lib, ({'url': 'https://cdn/x.jpg', 'id': 1, 'score': 5}, None, None), (False, 'transient'))
+    stats = update_lib.update('u', 'k')
+    assert len(update_lib.downloads) == 2 * (MAX_OUTAGE_RETRIES + 1)
+    assert stats['fail'] == [] and stats['new'] == 0
+    assert sorted(stats['outage']) == ['alice', 'bob']
+
+
+def test_update_artist_failures_are_not_retried(update_lib):
+    stub_network(update_lib, (None, "API 404: 未找到", 'artist'))
+    stats = update_lib.update('u', 'k')
+    assert update_lib.fetches == ['alice', 'bob']
+    assert stats['fail'] == ['alice', 'bob'] and stats['outage'] == []
@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from image_pack import ImagePack
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / 'images.pack'), str(tmp_path / 'images.pack.json')
+
+
+def test_put_get_and_ranges(paths):
+    pack = ImagePack(*paths)
+    pack.put('images/a.jpg', b'hello world')
+    assert 'images/a.jpg' in pack
+    assert pack.size('images/a.jpg') == 11
+    assert pack.get('images/a.jpg') == b'hello world'
+    assert pack.get('images/a.jpg', 6) == b'world'
+    assert pack.get('images/a.jpg', 0, 5) == b'hello'
+    assert pack.get('images/a.jpg', 6, 100) == b'world'
+
+
+def test_overwrite_keeps_latest(paths):
+    pack = ImagePack(*paths)
+    pack.put('k', b'old')
+    pack.put('k', b'newer')
+    assert pack.get('k') == b'newer'
+    assert ImagePack(*paths).get('k') == b'newer'
+
+
+def test_delete_survives_rebuild(paths):
+    pack = ImagePack(*paths)
+    pack.put('a', b'aaa')
+    pack.put('b', b'bbb')
+    pack.delete('a')
+    assert 'a' not in pack
+    os.remove(paths[1])  # 索引丢失，只能扫描 pack 重建
+    rebuilt = ImagePack(*paths)
+    assert rebuilt.keys() == ['b']
+    rebuilt.rebuild_index()
+    assert rebuilt.keys() == ['b']
+
+
+def test_delete_then_put_again(paths):
+    pack = ImagePack(*paths)
+    pack.put('a', b'one')
+    pack.delete('a')
+    pack.put('a', b'two')
+    os.remove(paths[1])
+    assert ImagePack(*paths).get('a') == b'two'
+
+
+def test_compact_drops_dead_records(paths):
+    pack = ImagePack(*paths)
+    pack.put('a', b'x' * 1000)
+    pack.put('a', b'y' * 10)
+    pack.put('b', b'z' * 500)
+    pack.delete('b')
+    reclaimed = pack.compact()
+    assert reclaimed > 1400
+    assert pack.keys() == ['a'] and pack.get('a') == b'y' * 10
+    os.remove(paths[1])
+    assert ImagePack(*paths).keys() == ['a']
+
+
+def test_truncated_tail_is_ignored(paths):
+    pack = ImagePack(*paths)
+    pack.put('a', b'aaa')
+    pack.put('b', b'bbbbbbbb')
+    pack.close()
+    with open(paths[0], 'r+b') as f:
+        f.truncate(os.path.getsize(paths[0]) - 3)
+    os.remove(paths[1])
+    assert ImagePack(*paths).keys() == ['a']
+
+
+def test_concurrent_instances_merge_index(paths):
+    a, b = ImagePack(*paths), ImagePack(*paths)
+    a.put('from_a', b'1')
+    b.put('from_b', b'2')
+    assert sorted(ImagePack(*paths).keys()) == ['from_a', 'from_b']
+    # 读方 refresh 后能看到别的实例写入的条目
+    assert a.refresh().get('from_b') == b'2'
+    b.delete('from_a')
+    assert 'from_a' not in a.refresh()
+
+
+def test_batched_puts_save_once(paths):
+    pack = ImagePack(*paths)
+    for i in range(5):
+        pack.put(f'k{i}', bytes([i]) * 3, save=False)
+    assert not os.path.exists(paths[1])
+    pack.save_index()
+    assert len(ImagePack(*paths).keys()) == 5
@@ -0,0 +1,39 @@
+import pytest
+
+from serve import parse_range, allowed
+
+
+@pytest.mark.parametrize('header, span', [
+    ('bytes=0-99', (0, 100)),
+    ('bytes=100-', (100, 1000)),
+    ('bytes=-100', (900, 1000)),
+    ('bytes=-5000', (0, 1000)),
+    ('bytes=900-5000', (900, 1000)),
+    ('bytes=999-999', (999, 1000)),
+])
+def test_parse_range_satisfiable(header, span):
+    assert parse_range(header, 1000) == span
+
+
+@pytest.mark.parametrize('header', ['bytes=1000-', 'bytes=1500-1600', 'bytes=50-10'])
+def test_parse_range_unsatisfiable(header):
+    assert parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize('header', ['items=0-1', 'bytes=0-1,5-9', 'bytes=-', 'bytes=a-b'])
+def test_parse_range_ignored(header):
+    # 不认识的格式按普通 200 响应处理
+    assert parse_range(header, 1000) == ()
+
+
+@pytest.mark.parametrize('rel', ['index.html', 'gallery.html', 'artist_data.json', 'showcase.json',
+                                 'similar_artists.json', 'images/10mo.jpg', 'gallery_images/img_1.jpg'])
+def test_allowed(rel):
+    assert allowed(rel)
+
+
+@pytest.mark.parametrize('rel', ['config.json', 'sample_state.json', 'serve.py', '.git/config', 'images.pack',
+                                 'images/../config.json', 'images/.DS_Store', 'images/sub/a.jpg',
+                                 'images\\..\\config.json', 'C:/windows/win.ini', '', 'images/'])
+def test_not_allowed(rel):
+    assert not allowed(rel)
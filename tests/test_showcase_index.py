@@ -0,0 +1,52 @@
+import pytest
+
+from showcase_index import parse_prompt, normalize_tag
+
+
+def weights(text):
+    return dict(parse_prompt(text))
+
+
+def test_plain_tags():
+    assert parse_prompt("wlop, 10mo\nmika pikazo，ask") == [
+        ('wlop', 1.0), ('10mo', 1.0), ('mika pikazo', 1.0), ('ask', 1.0)]
+
+
+def test_emphasis_brackets():
+    w = weights("{a}, {{b}}, [c], [[d]], {e, [f]}")
+    assert w['a'] == 1.05
+    assert w['b'] == pytest.approx(1.05 ** 2, abs=1e-3)
+    assert w['c'] == pytest.approx(1 / 1.05, abs=1e-3)
+    assert w['d'] == pytest.approx(1.05 ** -2, abs=1e-3)
+    assert w['e'] == 1.05
+    assert w['f'] == 1.0
+
+
+def test_explicit_weight_spans_commas():
+    w = weights("1.2::artist:foo, bar::, baz, -2::qux::")
+    assert w['artist:foo'] == 1.2
+    assert w['bar'] == 1.2
+    assert w['baz'] == 1.0
+    assert w['qux'] == -2.0
+
+
+def test_unmatched_closers_are_ignored():
+    assert weights("a]]]], b") == {'a': 1.0, 'b': 1.0}
+    assert weights("}}{a}, b") == {'a': 1.05, 'b': 1.0}
+    # 不配对的右括号不会关掉外层的 {
+    assert weights("{a], b}, c") == {'a': 1.05, 'b': 1.05, 'c': 1.0}
+
+
+def test_unclosed_brackets_apply_to_the_end():
+    assert weights("{{a, b") == {'a': pytest.approx(1.1025, abs=1e-3), 'b': pytest.approx(1.1025, abs=1e-3)}
+
+
+def test_empty_input():
+    assert parse_prompt("") == []
+    assert parse_prompt(None) == []
+    assert parse_prompt(" , ,{}") == []
+
+
+def test_normalize_tag():
+    assert normalize_tag("Artist: Mika  Pikazo") == ('mika_pikazo', True)
+    assert normalize_tag("ask \\(askzy\\)") == ('ask_(askzy)', False)
@@ -0,0 +1,228 @@
+# 监视模式：artists.txt / images/ / showcase.json 变动后增量更新网页用的数据
+# Linux 下用 inotify（ctypes 直接调用 libc，无额外依赖），其它平台退回定时轮询
+import os
+import sys
+import json
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+
+import artist_core
+import image_pack
+import showcase_index
+from artist_core import ARTIST_FILE, IMAGE_DIR, DATA_FILE, image_path, get_safe_filename
+
+# === 配置区域 ===
+WATCH_FILES = (ARTIST_FILE, showcase_index.SHOWCASE_FILE)
+WATCH_DIRS = (IMAGE_DIR,)
+DEBOUNCE = 0.3  # 最后一个事件之后静默这么久才开始处理
+MAX_DELAY = 0.8  # 持续有事件时，最多攒这么久也要处理一次
+POLL_INTERVAL = 0.5
+IGNORE_SUFFIXES = ('.part', '.tmp', '~')
+
+
+def _rel(path):
+    return os.path.relpath(path).replace('\\', '/')
+
+
+def _interesting(rel):
+    if rel.endswith(IGNORE_SUFFIXES): return False
+    return rel in WATCH_FILES or any(rel.startswith(d + '/') for d in WATCH_DIRS)
+
+
+class InotifyBackend:
+    IN_CLOSE_WRITE = 0x08
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_DELETE = 0x200
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init()
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init 失败")
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO | self.IN_DELETE
+        self.dirs = {}
+        # 单个文件用监视所在目录的方式，编辑器"写临时文件再改名"的保存方式也能捕获
+        for d in {os.path.dirname(f) or '.' for f in WATCH_FILES} | set(WATCH_DIRS):
+            os.makedirs(d, exist_ok=True)
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(d), mask)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"无法监视 {d}")
+            self.dirs[wd] = d
+
+    def wait(self, timeout):
+        """阻塞最多 timeout 秒，返回变动过的相对路径集合"""
+        changed = set()
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return changed
+        buf = os.read(self.fd, 65536)
+        pos = 0
+        while pos < len(buf):
+            wd, mask, cookie, length = self.EVENT.unpack_from(buf, pos)
+            pos += self.EVENT.size
+            name = buf[pos:pos + length].rstrip(b'\0').decode('utf-8', 'replace')
+            pos += length
+            if wd in self.dirs and name:
+                rel = _rel(os.path.join(self.dirs[wd], name))
+                if _interesting(rel): changed.add(rel)
+        return changed
+
+
+class PollingBackend:
+    """定时比较 (mtime, size) 快照，适用于没有 inotify 的平台"""
+
+    def __init__(self):
+        self.snapshot = self.scan()
+
+    def scan(self):
+        snap = {}
+        for f in WATCH_FILES:
+            if os.path.exists(f):
+                st = os.stat(f)
+                snap[_rel(f)] = (st.st_mtime_ns, st.st_size)
+        for d in WATCH_DIRS:
+            if not os.path.isdir(d): continue
+            with os.scandir(d) as it:
+                for e in it:
+                    if e.is_file():
+                        st = e.stat()
+                        snap[_rel(e.path)] = (st.st_mtime_ns, st.st_size)
+        return snap
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, POLL_INTERVAL))
+        new = self.snapshot
+        self.snapshot = self.scan()
+        changed = {k for k in new.keys() | self.snapshot.keys() if new.get(k) != self.snapshot.get(k)}
+        return {c for c in changed if _interesting(c)}
+
+
+def make_backend(force_poll=False):
+    if not force_poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyBackend()
+        except (OSError, AttributeError):
+            pass
+    return PollingBackend()
+
+
+class SiteWatcher:
+    def __init__(self, lib, backend):
+        self.lib = lib
+        self.backend = backend
+
+    def load_manifest(self):
+        try:
+            with open(DATA_FILE, 'r', encoding='utf-8') as f:
+                return {item['name']: item['image'] for item in json.load(f)}
+        except Exception:
+            return {}
+
+    def save_manifest(self, manifest):
+        data = [{"name": k, "image": v} for k, v in sorted(manifest.items())]
+        with open(DATA_FILE, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    def handle(self, changes, full=False):
+        """只更新受影响的画师条目；full=True 时对全部画师对账一次（启动时用）"""
+        t0 = time.perf_counter()
+        lib = self.lib
+        affected = set()
+        catalog_changed = False
+
+        if ARTIST_FILE in changes:
+            old = set(lib.artists)
+            lib.load_artists_from_file()
+            diff = old ^ set(lib.artists)
+            affected |= diff
+            catalog_changed = bool(diff)
+
+        images = [c for c in changes if c.startswith(IMAGE_DIR + '/')]
+        if images:
+            by_safe = {get_safe_filename(a): a for a in lib.artists}
+            pack = image_pack.get_pack()
+            for rel in images:
+                base = os.path.basename(rel)
+                stem, ext = os.path.splitext(base)
+                # 样图一律是 images/<安全文件名>.jpg；.DS_Store、Thumbs.db、png 等都不是画师
+                if ext != '.jpg' or base.startswith('.'): continue
+                name = by_safe.get(stem)
+                exists = os.path.exists(rel)
+                if name is None:
+                    # 文件名即画师名（必须已是规范写法，否则 image_path 对不上）
+                    name = artist_core.clean_name(stem)
+                    if not name or get_safe_filename(name) != stem: continue
+                    if exists:
+                        # 直接丢进 images/ 的新图
+                        lib.artists.append(name)
+                        lib.save_artists_to_file()
+                        catalog_changed = True
+                if pack:
+                    key = image_pack.pack_key(image_path(name))
+                    if exists:
+                        # 下载 / 手动替换 / optimize 写文件时自己已经入库，大小一致就不再重复追加
+                        if key not in pack or pack.size(key) != os.path.getsize(rel):
+                            pack.put_file(rel, key)
+                    elif name not in lib.artists:
+                        # 打包后本地文件是可选的：只删了散图不动 pack，画师本身被移除时才清掉
+                        pack.delete(key)
+                affected.add(name)
+
+        if full:
+            affected |= set(lib.artists) | set(self.load_manifest())
+
+        updated = 0
+        if affected:
+            manifest = self.load_manifest()
+            before = dict(manifest)
+            for name in affected:
+                path = image_path(name)
+                if name in lib.artists and lib.has_image(path):
+                    manifest[name] = path
+                else:
+                    manifest.pop(name, None)
+            updated = sum(1 for k in manifest.keys() | before.keys() if manifest.get(k) != before.get(k))
+            if updated:
+                self.save_manifest(manifest)
+
+        if catalog_changed or full or showcase_index.SHOWCASE_FILE in changes:
+            if os.path.exists(showcase_index.SHOWCASE_FILE):
+                idx, n = showcase_index.build_index()
+                lib.log(f"showcase_index.json 已更新 (重新解析 {n})")
+        if images or full:
+            lib.rebuild_similarity()
+
+        lib.log(f"[{time.strftime('%H:%M:%S')}] {len(changes)} 个文件变动，更新 {updated} 条画师记录，"
+                f"耗时 {(time.perf_counter() - t0) * 1000:.0f}ms")
+
+    def run(self):
+        self.lib.log(f"👀 开始监视 ({type(self.backend).__name__})，Ctrl+C 退出")
+        self.handle(set(), full=True)
+        pending, first = set(), None
+        while True:
+            # 有待处理事件时只等到去抖截止时间
+            timeout = 3600 if not pending else max(0.0, min(DEBOUNCE, first + MAX_DELAY - time.monotonic()))
+            got = self.backend.wait(timeout)
+            if got:
+                if not pending: first = time.monotonic()
+                pending |= got
+                if time.monotonic() - first < MAX_DELAY:
+                    continue
+            if pending:
+                batch, pending = pending, set()
+                try:
+                    self.handle(batch)
+                except Exception as e:
+                    self.lib.log(f"⚠️ 处理变动失败: {e}")
+
+
+def run(lib, force_poll=False):
+    try:
+        SiteWatcher(lib, make_backend(force_poll)).run()
+    except KeyboardInterrupt:
+        pass
+    return {}